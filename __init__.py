@@ -1,5 +1,5 @@
 from .config import Config
-from .speeches import AcousticDataset, VocoderDataset, WavDataset
+from .speeches import AcousticDataset, VocoderDataset, WavDataset, MultiTaskDataset
 # alias
 from . import datasets
 from . import speeches
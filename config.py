@@ -24,8 +24,23 @@ class Config:
         self.fmin = 0
         self.fmax = 8000
 
+        # pitch range
+        self.f0min = 65
+        self.f0max = 800
+
         # for preventing log-underflow
         self.eps = 1e-5
 
+        # output dtypes, 'float32', 'float16' or 'bfloat16'(stored as np.uint16) for features
+        # and 'int64', 'int32' or 'int16' for labels and lengths,
+        # sample counts of the waveforms are kept at least int32
+        self.dtype = 'float32'
+        self.label_dtype = 'int64'
+
+        # collate into the flat [sum(T), ...] with int32 cumulative offsets instead of padding
+        self.packed = False
+        # whether provide int32 segment ids of the packed batch
+        self.segment_ids = False
+
         # sample size
         self.batch = batch
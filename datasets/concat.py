@@ -1,7 +1,9 @@
-from typing import Callable, Dict, List, Tuple
+import threading
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
 
 import numpy as np
-from tqdm import tqdm
 
 from .reader import DataReader
 
@@ -9,24 +11,86 @@ from .reader import DataReader
 class ConcatReader(DataReader):
     """Concatenated data reader.
     """
-    def __init__(self, readers: List[DataReader]):
+    def __init__(self,
+                 readers: List[Union[DataReader, Callable[[], DataReader]]],
+                 workers: Optional[int] = None):
         """Initializer.
         Args:
-            readers: list of data readers.
+            readers: list of data readers or their factories,
+                factories are constructed concurrently on the thread pool.
+            workers: the number of the threads, the number of the factories default.
         """
-        self.readers = readers
-        self.speakers_ = [reader.speakers() for reader in readers]
-        # compute starting indices
-        indices = np.cumsum([0] + [len(speakers) for speakers in self.speakers_])
-        self.transcript = {
-            path: (sid + start, transcript)
-            for reader, start in zip(tqdm(self.readers, desc='concat'), indices)
-            for path, (sid, transcript) in tqdm(reader.dataset().items(), leave=False)}
-        # caching processor
-        self.mapper = {
-            path: reader.preproc()
-            for reader in self.readers
-            for path in reader.dataset()}
+        factories = [reader for reader in readers if not isinstance(reader, DataReader)]
+        self.executor = ThreadPoolExecutor(workers or len(factories)) if factories else None
+        self.futures = [
+            None if isinstance(reader, DataReader) else self.executor.submit(reader)
+            for reader in readers]
+        # resolved child readers
+        self.readers_ = [reader if isinstance(reader, DataReader) else None for reader in readers]
+        # starting speaker ids of the children, computed on demand
+        self.starts = [0]
+        # guard the resolution of the children and the starting ids
+        self.lock = threading.RLock()
+        self.transcript = ConcatReader.Transcript(self)
+        # flattened speakers, computed on demand
+        self.names = None
+
+    def __getstate__(self):
+        """Resolve all children, do not pickle the thread pool.
+        """
+        readers = self.readers
+        state = self.__dict__.copy()
+        state['executor'] = None
+        state['futures'] = [None] * len(readers)
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        """Restore with the fresh lock.
+        """
+        self.__dict__.update(state)
+        self.lock = threading.RLock()
+
+    def child(self, k: int) -> DataReader:
+        """Resolve the child reader, wait for the construction on the first touch.
+        Args:
+            k: index of the child.
+        Returns:
+            child reader.
+        """
+        reader = self.readers_[k]
+        if reader is not None:
+            return reader
+        with self.lock:
+            if self.readers_[k] is None:
+                self.readers_[k] = self.futures[k].result()
+                self.futures[k] = None
+                if self.executor is not None and all(r is not None for r in self.readers_):
+                    self.executor.shutdown(wait=False)
+                    self.executor = None
+            return self.readers_[k]
+
+    @property
+    def readers(self) -> List[DataReader]:
+        """Child readers, resolve all.
+        Returns:
+            list of the child readers.
+        """
+        return [self.child(k) for k in range(len(self.readers_))]
+
+    def start(self, k: int) -> int:
+        """Starting speaker id of the child.
+        Args:
+            k: index of the child.
+        Returns:
+            offset of the speaker ids.
+        """
+        if k < len(self.starts):
+            return self.starts[k]
+        with self.lock:
+            for j in range(len(self.starts) - 1, k):
+                self.starts.append(self.starts[j] + len(self.child(j).speakers()))
+            return self.starts[k]
 
     def dataset(self) -> Dict[str, Tuple[int, str]]:
         """Return file reader.
@@ -40,9 +104,32 @@ class ConcatReader(DataReader):
         Returns:
             list of the speakers.
         """
-        return [name
-            for speakers in self.speakers_
-            for name in speakers]
+        if self.names is None:
+            self.names = [name for reader in self.readers for name in reader.speakers()]
+        return self.names
+
+    def speaker_index(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return speaker-to-utterance index, merged from the child readers.
+        Returns:
+            [np.long; [S + 1]], offsets.
+            [np.long; [N']], indices of the utterances in order of `dataset()`.
+        """
+        if getattr(self, 'speaker_index_', None) is not None:
+            return self.speaker_index_
+        sizes = [len(reader.dataset()) for reader in self.readers]
+        if sum(sizes) != len(self.transcript):
+            # duplicated paths, fallback to the full scan
+            return super().speaker_index()
+        # starting indices of the utterances
+        starts = np.cumsum([0] + sizes)
+        offsets, utterances = [np.zeros(1, dtype=np.int64)], []
+        for reader, start in zip(self.readers, starts):
+            # [S_i + 1], [N_i']
+            offset, utterance = reader.speaker_index()
+            offsets.append(offset[1:] + offsets[-1][-1])
+            utterances.append(utterance + start)
+        self.speaker_index_ = np.concatenate(offsets), np.concatenate(utterances)
+        return self.speaker_index_
 
     def preproc(self) -> Callable:
         """Return the preprocessor.
@@ -64,8 +151,68 @@ class ConcatReader(DataReader):
                 text: str, text.
                 audio: [np.float32; T], raw speech signal in range(-1, 1).
         """
+        k = self.transcript.owner(path)
+        if k is None:
+            raise KeyError(path)
         # preprocessing
-        _, _, audio = self.mapper[path](path)
+        _, _, audio = self.child(k).preproc()(path)
         # int, str
-        sid, text = self.transcript.get(path, (-1, ''))
+        sid, text = self.transcript[path]
         return sid, text, audio
+
+    class Transcript(Mapping):
+        """Lazy view of the concatenated transcripts,
+        resolve the child readers in order on the first touch.
+        If the paths are duplicated, the entry of the preceding child is used.
+        """
+        def __init__(self, concat):
+            """Initializer.
+            Args:
+                concat: ConcatReader, concatenated reader.
+            """
+            self.concat = concat
+            # the number of the unique paths, computed on demand
+            self.size = None
+
+        def owner(self, path: str) -> Optional[int]:
+            """Find the child reader holding the path.
+            Args:
+                path: path to the datum.
+            Returns:
+                index of the child, None if not found.
+            """
+            for k in range(len(self.concat.readers_)):
+                if path in self.concat.child(k).dataset():
+                    return k
+            return None
+
+        def __getitem__(self, path: str) -> Tuple[int, str]:
+            """Lookup the transcript.
+            Args:
+                path: path to the datum.
+            Returns:
+                speaker id, offset by the preceding children, and transcript.
+            """
+            k = self.owner(path)
+            if k is None:
+                raise KeyError(path)
+            sid, text = self.concat.child(k).dataset()[path]
+            return sid + self.concat.start(k), text
+
+        def __iter__(self) -> Iterator[str]:
+            """Iterate the unique paths in order of the children.
+            """
+            trans = []
+            for k in range(len(self.concat.readers_)):
+                current = self.concat.child(k).dataset()
+                for path in current:
+                    if not any(path in prev for prev in trans):
+                        yield path
+                trans.append(current)
+
+        def __len__(self) -> int:
+            """The number of the unique paths.
+            """
+            if self.size is None:
+                self.size = sum(1 for _ in self)
+            return self.size
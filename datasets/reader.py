@@ -1,6 +1,5 @@
 from typing import Callable, Dict, List, Tuple
 
-import librosa
 import numpy as np
 
 
@@ -15,6 +14,8 @@ class DataReader:
         Returns:
             [np.float32; [T]], audio signal, [-1, 1]-ranged.
         """
+        # lazy import, heavy dependencies
+        import librosa
         audio, _ = librosa.load(path, sr=sr)
         return audio.astype(np.float32)
 
@@ -32,6 +33,38 @@ class DataReader:
         """
         raise NotImplementedError('DataReader.speakers is not implemented')
 
+    def speaker_index(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return speaker-to-utterance index, computed once and cached.
+        Returns:
+            [np.long; [S + 1]], offsets, utterances of the speaker `s` are
+                `utterances[offsets[s]:offsets[s + 1]]`.
+            [np.long; [N']], indices of the utterances in order of `dataset()`.
+        """
+        if getattr(self, 'speaker_index_', None) is None:
+            sids = np.array([sid for sid, _ in self.dataset().values()], dtype=np.int64)
+            self.speaker_index_ = DataReader.csr(sids, len(self.speakers()))
+        return self.speaker_index_
+
+    @staticmethod
+    def csr(sids: np.ndarray, speakers: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Construct CSR-style speaker-to-utterance index.
+        Args:
+            sids: [np.long; [N]], speaker ids of the utterances, negative for unknown.
+            speakers: the number of the speakers.
+        Returns:
+            [np.long; [S + 1]], offsets.
+            [np.long; [N']], indices of the utterances grouped by speakers,
+                utterances of the unknown speakers are excluded.
+        """
+        # [N], stable for keeping the order of the utterances
+        order = np.argsort(sids, kind='stable')
+        # [S]
+        counts = np.bincount(sids[sids >= 0], minlength=speakers)
+        # [S + 1]
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        # [N'], skip unknown speakers
+        return offsets, order[(sids < 0).sum():].astype(np.int64)
+
     def preproc(self) -> Callable:
         """Return data preprocessor.
         Returns:
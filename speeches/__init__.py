@@ -1,4 +1,8 @@
+from .pipeline import Pipeline
+from .sampler import Sampler, SpeakerSampler
+from .shuffle import ShuffleBuffer
 from .speechset import SpeechSet
 from .acoustic import AcousticDataset
 from .vocoder import VocoderDataset
 from .wav import WavDataset
+from .multitask import MultiTaskDataset
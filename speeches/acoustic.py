@@ -5,7 +5,7 @@ import numpy as np
 from .speechset import SpeechSet
 from ..config import Config
 from ..datasets import DataReader
-from ..utils import MelSTFT, TextNormalizer
+from ..utils import MelSTFT, PitchEstimator, Precision, TextNormalizer
 
 
 class AcousticDataset(SpeechSet):
@@ -16,57 +16,122 @@ class AcousticDataset(SpeechSet):
     def __init__(self,
                  rawset: DataReader,
                  config: Config,
-                 report_level: Optional[int] = None):
+                 report_level: Optional[int] = None,
+                 energy: bool = False,
+                 pitch: bool = False):
         """Initializer.
         Args:
             rawset: file-format datum reader.
             config: configuration.
             report_level: text normalizing error report level.
+            energy: whether provide frame energy or not.
+            pitch: whether provide frame-level fundamental frequency or not.
         """
         # cache dataset and preprocessor
         super().__init__(rawset)
         self.config = config
+        self.precision = Precision(config)
         self.melstft = MelSTFT(config)
         self.textnorm = TextNormalizer(report_level)
+        self.energy = energy
+        self.pitch = PitchEstimator(config) if pitch else None
 
     def normalize(self, _: int, text: str, speech: np.ndarray) \
-            -> Tuple[np.ndarray, np.ndarray]:
+            -> Tuple[np.ndarray, ...]:
         """Normalize datum.
         Args:
             text: transcription.
             speech: [np.float32; [T]], speech in range (-1, 1).
         Returns:
             normalized datum.
-                labels: [np.long; [S]], labeled text sequence.
-                mel: [np.float32; [T // hop, mel]], mel spectrogram.
+                labels: [config.label_dtype; [S]], labeled text sequence.
+                mel: [config.dtype; [T // hop, mel]], mel spectrogram.
+                (optional) energy: [config.dtype; [T // hop]], frame energy.
+                (optional) pitch: [np.float32; [T // hop]], fundamental frequency.
         """
         # [S]
-        labels = np.array(self.textnorm.labeling(text), dtype=np.long)
-        # [T // hop, mel]
-        mel = self.melstft(speech)
-        return labels, mel
+        labels = self.precision.lengths(self.textnorm.labeling(text))
+        if not self.energy:
+            # [T // hop, mel]
+            mel = self.melstft(speech)
+            extras = []
+        else:
+            # [T // hop, mel], _, [T // hop], reuse the magnitude
+            mel, _, energy = self.melstft(speech, aux=True)
+            extras = [energy]
+        if self.pitch is not None:
+            # [T // hop]
+            extras.append(self.pitch(speech))
+        return (labels, mel, *extras)
 
-    def collate(self, bunch: List[Tuple[np.ndarray, np.ndarray]]) \
-            -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    def collate(self, bunch: List[Tuple[np.ndarray, ...]]) -> Tuple[np.ndarray, ...]:
         """Collate bunch of datum to the batch data.
         Args:
             bunch: B x [...] list of normalized inputs.
-                labels: [np.long; [Si]], labled text sequence.
-                mel: [np.float32; [Ti, mel]], mel spectrogram.
+                labels: [config.label_dtype; [Si]], labled text sequence.
+                mel: [config.dtype; [Ti, mel]], mel spectrogram.
+                (optional) energy: [config.dtype; [Ti]], frame energy.
+                (optional) pitch: [np.float32; [Ti]], fundamental frequency.
         Returns:
             batch data.
-                text: [np.long; [B, S]], labeled text sequence.
-                mel: [np.float32; [B, T, mel]], mel spectrogram.
-                textlen: [np.long; [B]], text lengths.
-                mellen: [np.long; [B]], spectrogram lengths.
+                text: [config.label_dtype; [B, S]], labeled text sequence.
+                mel: [config.dtype; [B, T, mel]], mel spectrogram.
+                textlen: [config.label_dtype; [B]], text lengths.
+                mellen: [config.label_dtype; [B]], spectrogram lengths.
+                (optional) energy: [config.dtype; [B, T]], frame energy.
+                (optional) pitch: [config.dtype; [B, T]], fundamental frequency.
+            if `config.packed` is True, reference `AcousticDataset.collate_packed`.
         """
+        if self.config.packed:
+            return self.collate_packed(bunch)
         # [B], [B]
-        textlen, mellen = np.array(
-            [[len(labels), len(spec)] for labels, spec in bunch], dtype=np.long).T
+        textlen, mellen = self.precision.lengths(
+            [[len(labels), len(spec)] for labels, spec, *_ in bunch]).T
         # [B, S]
-        text = np.stack(
-            [np.pad(labels, [0, textlen.max() - len(labels)]) for labels, _ in bunch])
+        text = self.allocate([len(bunch), textlen.max()], self.precision.label)
         # [B, T, mel]
-        mel = np.stack(
-            [np.pad(spec, [[0, mellen.max() - len(spec)], [0, 0]]) for _, spec in bunch])
-        return text, mel, textlen, mellen
+        mel = self.allocate(
+            [len(bunch), mellen.max(), bunch[0][1].shape[-1]], self.precision.feature)
+        # K x [B, T]
+        extras = [
+            self.allocate([len(bunch), mellen.max()], self.precision.feature)
+            for _ in bunch[0][2:]]
+        for i, (labels, spec, *features) in enumerate(bunch):
+            text[i, :len(labels)] = labels
+            # cast in place while filling
+            self.precision.cast(spec, out=mel[i, :len(spec)])
+            for extra, feature in zip(extras, features):
+                self.precision.cast(feature, out=extra[i, :len(feature)])
+        return (text, mel, textlen, mellen, *extras)
+
+    def collate_packed(self, bunch: List[Tuple[np.ndarray, ...]]) -> Tuple[np.ndarray, ...]:
+        """Collate bunch of datum to the packed batch data, without padding.
+        Args:
+            bunch: B x [...] list of normalized inputs, same as `AcousticDataset.collate`.
+        Returns:
+            packed batch data.
+                text: [config.label_dtype; [sum(S)]], labeled text sequence.
+                mel: [config.dtype; [sum(T), mel]], mel spectrogram.
+                cu_textlens: [np.int32; [B + 1]], cumulative text lengths.
+                cu_mellens: [np.int32; [B + 1]], cumulative spectrogram lengths.
+                (optional) energy: [config.dtype; [sum(T)]], frame energy.
+                (optional) pitch: [config.dtype; [sum(T)]], fundamental frequency.
+                if `config.segment_ids` is True, additionally,
+                    [np.int32; [sum(S)]], [np.int32; [sum(T)]], segment ids of text and mel.
+        """
+        segment_ids = self.config.segment_ids
+        # [sum(S)], [B + 1], (optional) [sum(S)]
+        text, cu_textlens, *textseg = self.pack(
+            [labels for labels, *_ in bunch], self.precision.label, segment_ids=segment_ids)
+        # [sum(T), mel], [B + 1], (optional) [sum(T)]
+        mel, cu_mellens, *melseg = self.pack(
+            [spec for _, spec, *_ in bunch], self.precision.feature,
+            fill=lambda spec, out: self.precision.cast(spec, out=out),
+            segment_ids=segment_ids)
+        # K x [sum(T)]
+        extras = [
+            self.pack(
+                [features[k] for _, _, *features in bunch], self.precision.feature,
+                fill=lambda feature, out: self.precision.cast(feature, out=out))[0]
+            for k in range(len(bunch[0]) - 2)]
+        return (text, mel, cu_textlens, cu_mellens, *extras, *textseg, *melseg)
@@ -0,0 +1,151 @@
+import copy
+import threading
+from typing import Any, List, Tuple
+
+import numpy as np
+
+from .speechset import SpeechSet
+from ..utils import MelSTFT, MultiMelSTFT
+
+
+class SharedMelSTFT:
+    """Memoize the last spectrogram per thread,
+    share the single STFT of the same signal across the tasks.
+    """
+    def __init__(self, melstft: MelSTFT):
+        """Initializer.
+        Args:
+            melstft: mel-spectrogram generator.
+        """
+        self.melstft = melstft
+        self.config = melstft.config
+        self.local = threading.local()
+
+    def __getstate__(self):
+        """Do not pickle the thread-local memo.
+        """
+        state = self.__dict__.copy()
+        del state['local']
+        return state
+
+    def __setstate__(self, state):
+        """Restore with the fresh memo.
+        """
+        self.__dict__.update(state)
+        self.local = threading.local()
+
+    def __call__(self, signal: np.ndarray, aux: bool = False) -> Any:
+        """Generate log-mel scale power spectrogram, reuse if the signal is the same.
+        Args:
+            signal: [np.float32; [T]], speech signal.
+            aux: whether return the linear magnitude and frame energy or not.
+        Returns:
+            outputs of `MelSTFT`.
+        """
+        # hold the signal on the memo, so that identity comparison is safe
+        memo = getattr(self.local, 'memo', None)
+        if memo is not None and memo[0] is signal and (memo[1] or not aux):
+            _, cached, outputs = memo
+            return outputs[0] if cached and not aux else outputs
+        outputs = self.melstft(signal, aux=aux)
+        self.local.memo = (signal, aux, outputs)
+        return outputs
+
+
+class SplitMelSTFT:
+    """Take the main resolution from the shared generator
+    and compute only the auxiliary resolutions, drop-in of `MultiMelSTFT`.
+    """
+    def __init__(self, main: SharedMelSTFT, auxes: MultiMelSTFT):
+        """Initializer.
+        Args:
+            main: shared generator of the main resolution.
+            auxes: generator of the auxiliary resolutions.
+        """
+        self.main = main
+        self.auxes = auxes
+        self.configs = [main.config, *auxes.configs]
+
+    def __call__(self, signal: np.ndarray) -> List[np.ndarray]:
+        """Generate log-mel scale power spectrograms from inputs.
+        Args:
+            signal: [np.float32; [T]], speech signal.
+        Returns:
+            list of the spectrograms, in order of the configurations.
+        """
+        return [self.main(signal), *self.auxes(signal)]
+
+
+class MultiTaskDataset(SpeechSet):
+    """Fan-out dataset, decode and featurize each datum once for multiple tasks.
+    """
+    def __init__(self, tasks: List[SpeechSet]):
+        """Initializer.
+        Args:
+            tasks: datasets of the targets on the same reader, eg. acoustic and vocoder.
+                mel-spectrogram generators of the equal configurations are shared.
+        """
+        assert len(tasks) > 0, 'at least one task is required'
+        super().__init__(tasks[0].reader)
+        assert all(task.indexer == self.indexer for task in tasks), \
+            'tasks should share the same reader and indexer'
+        shared = {}
+        self.tasks = [self.share(task, shared) for task in tasks]
+
+    # configurations affecting the mel-spectrogram
+    STFT = ['sr', 'fft', 'hop', 'win', 'win_fn', 'mel', 'fmin', 'fmax', 'eps', 'dtype']
+
+    @staticmethod
+    def share(task: SpeechSet, shared: dict) -> SpeechSet:
+        """Replace the mel-spectrogram generator with the shared one.
+        Args:
+            task: dataset, copied before modification.
+            shared: shared generators, keyed by the configurations.
+        Returns:
+            dataset with the shared generator.
+        """
+        task = copy.copy(task)
+        if isinstance(getattr(task, 'speechset', None), SpeechSet):
+            # wrapped dataset, eg. IDWrapper
+            task.speechset = MultiTaskDataset.share(task.speechset, shared)
+        melstft = getattr(task, 'melstft', None)
+        if isinstance(melstft, (MelSTFT, SharedMelSTFT)):
+            key = tuple(getattr(melstft.config, name) for name in MultiTaskDataset.STFT)
+            if key not in shared:
+                shared[key] = melstft if isinstance(melstft, SharedMelSTFT) \
+                    else SharedMelSTFT(melstft)
+            task.melstft = shared[key]
+            multistft = getattr(task, 'multistft', None)
+            if isinstance(multistft, MultiMelSTFT) and multistft.configs[0] is melstft.config:
+                # multi-resolution generator, eg. `VocoderDataset` with auxiliary configurations,
+                # reuse the shared main resolution
+                task.multistft = SplitMelSTFT(task.melstft, MultiMelSTFT(multistft.configs[1:]))
+        return task
+
+    def normalize(self, sid: int, text: str, speech: np.ndarray) -> Tuple[Any, ...]:
+        """Normalize datum for each task.
+        Args:
+            sid: speaker id.
+            text: transcription.
+            speech: [np.float32; [T]], speech in range (-1, 1).
+        Returns:
+            normalized datum of the tasks, in order of the tasks.
+        """
+        return tuple(task.normalize(sid, text, speech) for task in self.tasks)
+
+    def collate(self, bunch: List[Tuple[Any, ...]]) -> Tuple[Any, ...]:
+        """Collate bunch of datum to the aligned batches.
+        Args:
+            bunch: B x [...], list of normalized inputs of the tasks.
+        Returns:
+            batch data of the tasks, in order of the tasks.
+        """
+        batches = []
+        for i, task in enumerate(self.tasks):
+            # route the collation buffers, including wrapped datasets
+            target = task
+            while isinstance(target, SpeechSet):
+                target.allocate = self.allocate
+                target = getattr(target, 'speechset', None)
+            batches.append(task.collate([datum[i] for datum in bunch]))
+        return tuple(batches)
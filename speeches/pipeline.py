@@ -0,0 +1,251 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+from ..datasets import DataReader
+
+
+class Pipeline:
+    """Lazy transform pipeline over the speech dataset.
+    Consecutive map and filter stages are fused into the single function
+    and nothing is evaluated until the pipeline is iterated.
+    """
+    # marker of the filtered item
+    SKIP = object()
+
+    def __init__(self,
+                 keys: List[Any],
+                 fetch: Callable[[Any], Any],
+                 collate: Optional[Callable[[List[Any]], Any]] = None,
+                 stages: Optional[List[Tuple[str, Any]]] = None,
+                 workers: Optional[Tuple[int, int]] = None):
+        """Initializer.
+        Args:
+            keys: keys of the data, eg. paths.
+            fetch: loader of the single datum from the key.
+            collate: default collator for batch stage, list of the items if not provided.
+            stages: list of the (kind, argument) stages.
+            workers: prefetch window and the number of the worker threads.
+        """
+        self.keys = keys
+        self.fetch = fetch
+        self.collate = collate
+        self.stages = stages or []
+        self.workers = workers
+
+    @classmethod
+    def from_reader(cls, reader: DataReader):
+        """Construct pipeline over the raw outputs of the reader.
+        Args:
+            reader: data reader.
+        Returns:
+            pipeline of the (sid, text, speech) tuples.
+        """
+        return cls(list(reader.dataset().keys()), reader.preproc())
+
+    def derive(self, kind: str, arg: Any):
+        """Append the stage.
+        Args:
+            kind: kind of the stage.
+            arg: argument of the stage.
+        Returns:
+            Pipeline, new pipeline with the stage.
+        """
+        return Pipeline(
+            self.keys, self.fetch, self.collate, self.stages + [(kind, arg)], self.workers)
+
+    def map(self, fn: Callable[[Any], Any]):
+        """Transform the items.
+        Args:
+            fn: transform.
+        Returns:
+            Pipeline, mapped pipeline.
+        """
+        return self.derive('map', fn)
+
+    def filter(self, fn: Callable[[Any], bool]):
+        """Filter the items.
+        Args:
+            fn: predicate, keep the item if true.
+        Returns:
+            Pipeline, filtered pipeline.
+        """
+        return self.derive('filter', fn)
+
+    def batch(self,
+              size: int,
+              collate: Optional[Callable[[List[Any]], Any]] = None,
+              drop_last: bool = False):
+        """Group the items into batches.
+        Args:
+            size: size of the batch.
+            collate: collator, pipeline default if not provided.
+            drop_last: whether drop the last incomplete batch or not.
+        Returns:
+            Pipeline, batched pipeline.
+        """
+        return self.derive('batch', (size, collate or self.collate, drop_last))
+
+    def cache(self):
+        """Memorize the items after the first full iteration.
+        Returns:
+            Pipeline, cached pipeline.
+        """
+        # shared storage for derived pipelines
+        return self.derive('cache', {'items': None})
+
+    def prefetch(self, size: int = 16, workers: int = 4):
+        """Evaluate the fused stages before the first batch or cache
+        on the worker threads with bounded window.
+        Args:
+            size: the number of the outstanding items.
+            workers: the number of the worker threads.
+        Returns:
+            Pipeline, prefetched pipeline.
+        """
+        return Pipeline(self.keys, self.fetch, self.collate, self.stages, (size, workers))
+
+    @staticmethod
+    def fuse(fns: List[Tuple[str, Callable]]) -> Callable[[Any], Any]:
+        """Fuse the map and filter stages.
+        Args:
+            fns: list of the (kind, function) stages.
+        Returns:
+            fused function, return `Pipeline.SKIP` for filtered item.
+        """
+        def fused(item: Any) -> Any:
+            for kind, fn in fns:
+                if kind == 'map':
+                    item = fn(item)
+                elif not fn(item):
+                    return Pipeline.SKIP
+            return item
+        return fused
+
+    def segments(self) -> Tuple[int, List[Tuple[Callable, Optional[Tuple[str, Any]]]]]:
+        """Split the stages with batch and cache boundaries.
+        Returns:
+            starting segment after the latest filled cache,
+            list of the fused function and the boundary stage.
+        """
+        segments, fns = [], []
+        for kind, arg in self.stages:
+            if kind in ['map', 'filter']:
+                fns.append((kind, arg))
+                continue
+            segments.append((Pipeline.fuse(fns), (kind, arg)))
+            fns = []
+        segments.append((Pipeline.fuse(fns), None))
+        # start from the latest filled cache
+        start = 0
+        for i, (_, boundary) in enumerate(segments):
+            if boundary is not None and boundary[0] == 'cache' \
+                    and boundary[1]['items'] is not None:
+                start = i + 1
+        return start, segments
+
+    def source(self, fused: Callable[[Any], Any]) -> Iterator[Any]:
+        """Fetch and transform the items.
+        Args:
+            fused: fused function of the first segment.
+        Returns:
+            transformed items.
+        """
+        def task(key: Any) -> Any:
+            return fused(self.fetch(key))
+
+        if self.workers is None:
+            yield from map(task, self.keys)
+            return
+        size, workers = self.workers
+        with ThreadPoolExecutor(workers) as pool:
+            keys, window = iter(self.keys), deque()
+            for key in keys:
+                window.append(pool.submit(task, key))
+                if len(window) >= size:
+                    break
+            while window:
+                item = window.popleft().result()
+                key = next(keys, Pipeline.SKIP)
+                if key is not Pipeline.SKIP:
+                    window.append(pool.submit(task, key))
+                yield item
+
+    def __iter__(self) -> Iterator[Any]:
+        """Evaluate the pipeline.
+        Returns:
+            transformed items.
+        """
+        start, segments = self.segments()
+        if start == 0:
+            fused, boundary = segments[0]
+            items = self.source(fused)
+        else:
+            # cached items, already transformed by the previous segments
+            _, (_, storage) = segments[start - 1]
+            fused, boundary = segments[start]
+            items = map(fused, storage['items'])
+        yield from self.chain(items, boundary, segments[start + 1:])
+
+    def chain(self,
+              items: Iterator[Any],
+              boundary: Optional[Tuple[str, Any]],
+              rest: List[Tuple[Callable, Optional[Tuple[str, Any]]]]) -> Iterator[Any]:
+        """Apply the boundary stage and the remaining segments.
+        Args:
+            items: transformed items of the current segment.
+            boundary: boundary stage of the current segment.
+            rest: remaining segments.
+        Returns:
+            transformed items.
+        """
+        items = (item for item in items if item is not Pipeline.SKIP)
+        if boundary is not None:
+            kind, arg = boundary
+            if kind == 'batch':
+                items = Pipeline.batcher(items, *arg)
+            elif kind == 'cache':
+                items = Pipeline.cacher(items, arg)
+        if not rest:
+            yield from items
+            return
+        (fused, next_boundary), *rest = rest
+        yield from self.chain(map(fused, items), next_boundary, rest)
+
+    @staticmethod
+    def batcher(items: Iterator[Any],
+                size: int,
+                collate: Optional[Callable[[List[Any]], Any]],
+                drop_last: bool) -> Iterator[Any]:
+        """Group the items.
+        Args:
+            items: items.
+            size: size of the batch.
+            collate: collator.
+            drop_last: whether drop the last incomplete batch or not.
+        Returns:
+            batches.
+        """
+        bunch = []
+        for item in items:
+            bunch.append(item)
+            if len(bunch) == size:
+                yield bunch if collate is None else collate(bunch)
+                bunch = []
+        if bunch and not drop_last:
+            yield bunch if collate is None else collate(bunch)
+
+    @staticmethod
+    def cacher(items: Iterator[Any], storage: dict) -> Iterator[Any]:
+        """Memorize the items, storage is filled only after the full iteration.
+        Args:
+            items: items.
+            storage: cache storage.
+        Returns:
+            items.
+        """
+        cached = []
+        for item in items:
+            cached.append(item)
+            yield item
+        storage['items'] = cached
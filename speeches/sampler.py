@@ -0,0 +1,181 @@
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+from ..datasets import DataReader
+
+
+class Sampler:
+    """Seeded per-epoch sampler of the dataset indices.
+    Order of the epoch is determined only by the seed and the epoch,
+    so that the sampling could be resumed from any step without replay.
+    """
+    def __init__(self,
+                 size: int,
+                 batch: Optional[int] = None,
+                 shuffle: bool = True,
+                 seed: int = 0,
+                 drop_last: bool = False):
+        """Initializer.
+        Args:
+            size: size of the dataset.
+            batch: size of the batch, if None is provided, single index will be sampled.
+            shuffle: whether shuffle the indices for each epoch or not.
+            seed: random seed.
+            drop_last: whether drop the last incomplete batch or not.
+        """
+        self.size = size
+        self.batch = batch
+        self.shuffle = shuffle
+        self.seed = seed
+        self.drop_last = drop_last
+        # cache of the latest epoch order
+        self.cache = None
+
+    def order(self, epoch: int) -> np.ndarray:
+        """Generate the order of the epoch.
+        Args:
+            epoch: epoch.
+        Returns:
+            [np.long; [size]], permutation of the indices.
+        """
+        if self.cache is None or self.cache[0] != epoch:
+            if self.shuffle:
+                order = np.random.default_rng([self.seed, epoch]).permutation(self.size)
+            else:
+                order = np.arange(self.size)
+            self.cache = (epoch, order)
+        return self.cache[1]
+
+    def __len__(self) -> int:
+        """Return the number of the steps in an epoch.
+        Returns:
+            the number of the steps.
+        """
+        if self.batch is None:
+            return self.size
+        if self.drop_last:
+            return self.size // self.batch
+        return -(-self.size // self.batch)
+
+    def indices(self, epoch: int, step: int) -> Union[int, List[int]]:
+        """Sample the indices of the step.
+        Args:
+            epoch: epoch.
+            step: step in the epoch.
+        Returns:
+            index if batch is None, otherwise list of the indices.
+        """
+        order = self.order(epoch)
+        if self.batch is None:
+            return int(order[step])
+        return order[step * self.batch:(step + 1) * self.batch].tolist()
+
+    def state_dict(self) -> Dict[str, Any]:
+        """Serializable state of the sampler.
+        Returns:
+            state of the sampler.
+        """
+        return {
+            'size': self.size,
+            'batch': self.batch,
+            'shuffle': self.shuffle,
+            'seed': self.seed,
+            'drop_last': self.drop_last}
+
+    def load_state_dict(self, state: Dict[str, Any]):
+        """Restore the state.
+        Args:
+            state: state of the sampler.
+        """
+        assert state['size'] == self.size, \
+            f'size mismatch, expected {self.size} but got {state["size"]}'
+        self.batch = state['batch']
+        self.shuffle = state['shuffle']
+        self.seed = state['seed']
+        self.drop_last = state['drop_last']
+        self.cache = None
+
+
+class SpeakerSampler:
+    """Seeded sampler of P speakers x K utterances batches.
+    Each batch is sampled independently from the seed, epoch and step,
+    so that the sampling could be resumed from any step without replay.
+    """
+    def __init__(self,
+                 speechset,
+                 speakers: int,
+                 utterances: int,
+                 seed: int = 0,
+                 steps: Optional[int] = None):
+        """Initializer.
+        Args:
+            speechset: SpeechSet, dataset.
+            speakers: the number of the speakers in a batch, P.
+            utterances: the number of the utterances per speaker, K.
+            seed: random seed.
+            steps: the number of the steps in an epoch, N // (P x K) default.
+        """
+        self.speakers = speakers
+        self.utterances = utterances
+        self.seed = seed
+        self.steps = steps or max(len(speechset) // (speakers * utterances), 1)
+        reader = speechset.reader
+        if speechset.indexer == list(speechset.dataset):
+            # unsplitted and not reordered, indexer is in order of the reader
+            self.offsets, self.indices_ = reader.speaker_index()
+        else:
+            self.offsets, self.indices_ = DataReader.csr(
+                np.array([speechset.dataset[path][0] for path in speechset.indexer],
+                         dtype=np.int64),
+                len(reader.speakers()))
+        # [S'], speakers with any utterance
+        self.valid, = np.nonzero(np.diff(self.offsets) > 0)
+        assert len(self.valid) >= speakers, \
+            f'{len(self.valid)} speakers are available, but {speakers} are required'
+
+    def __len__(self) -> int:
+        """Return the number of the steps in an epoch.
+        Returns:
+            the number of the steps.
+        """
+        return self.steps
+
+    def indices(self, epoch: int, step: int) -> List[int]:
+        """Sample the indices of the step in O(P x K).
+        Args:
+            epoch: epoch.
+            step: step in the epoch.
+        Returns:
+            P x K indices, grouped by speakers.
+        """
+        rng = np.random.default_rng([self.seed, epoch, step])
+        indices = []
+        for sid in self.valid[rng.choice(len(self.valid), self.speakers, replace=False)]:
+            start, end = self.offsets[sid], self.offsets[sid + 1]
+            # sample with replacement only if insufficient
+            choice = rng.choice(
+                end - start, self.utterances, replace=end - start < self.utterances)
+            indices.extend(self.indices_[start + choice].tolist())
+        return indices
+
+    def state_dict(self) -> Dict[str, Any]:
+        """Serializable state of the sampler.
+        Returns:
+            state of the sampler.
+        """
+        return {
+            'speakers': self.speakers,
+            'utterances': self.utterances,
+            'seed': self.seed,
+            'steps': self.steps}
+
+    def load_state_dict(self, state: Dict[str, Any]):
+        """Restore the state.
+        Args:
+            state: state of the sampler.
+        """
+        self.speakers = state['speakers']
+        self.utterances = state['utterances']
+        self.seed = state['seed']
+        self.steps = state['steps']
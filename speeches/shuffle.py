@@ -0,0 +1,197 @@
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+
+class ShuffleBuffer:
+    """Block-shuffle iterator with the bounded in-memory buffer.
+    Contiguous blocks of the dataset are read in shuffled block order,
+    and the data are emitted randomly from the buffer,
+    which gives near-random order with near-sequential reads.
+    Iterator stops at the end of each epoch and continues with the next epoch.
+    """
+    def __init__(self,
+                 speechset,
+                 batch: Optional[int] = None,
+                 block: int = 64,
+                 buffer: int = 1024,
+                 seed: int = 0,
+                 drop_last: bool = False):
+        """Initializer.
+        Args:
+            speechset: SpeechSet, dataset, read in order of the indexer.
+            batch: size of the batch, if None is provided, single datum will be returned.
+            block: the number of the contiguous data in a block.
+            buffer: size of the shuffle buffer.
+            seed: random seed.
+            drop_last: whether drop the last incomplete batch or not.
+        """
+        self.speechset = speechset
+        self.batch = batch
+        self.block = block
+        self.buffer = buffer
+        self.seed = seed
+        self.drop_last = drop_last
+        self.epoch = 0
+        self.position = 0
+        # read order, emit order and loaded data
+        self.plan = None
+        self.loaded, self.data = 0, {}
+        # read statistics
+        self.nbytes, self.elapsed = 0, 0.
+
+    def schedule(self, epoch: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Simulate the block-shuffle on the indices.
+        Before emitting k-th datum, min(buffer + k, N) data are read.
+        Args:
+            epoch: epoch.
+        Returns:
+            [np.long; [N]], read order.
+            [np.long; [N]], emit order.
+        """
+        size = len(self.speechset)
+        rng = np.random.default_rng([self.seed, epoch])
+        # [N], shuffled blocks of the contiguous indices
+        blocks = rng.permutation(-(-size // self.block))
+        reads = np.concatenate(
+            [np.arange(b * self.block, min((b + 1) * self.block, size)) for b in blocks]
+            or [np.zeros(0, dtype=np.int64)])
+        # simulate the buffer
+        pool = reads[:self.buffer].tolist()
+        picks = rng.random(size)
+        emits = np.empty(size, dtype=np.int64)
+        for k in range(size):
+            j = int(picks[k] * len(pool))
+            emits[k] = pool[j]
+            nxt = self.buffer + k
+            if nxt < size:
+                pool[j] = reads[nxt]
+            else:
+                pool[j] = pool[-1]
+                pool.pop()
+        return reads, emits
+
+    def __len__(self) -> int:
+        """Return the number of the steps in an epoch.
+        Returns:
+            the number of the steps.
+        """
+        size = len(self.speechset)
+        if self.batch is None:
+            return size
+        if self.drop_last:
+            return size // self.batch
+        return -(-size // self.batch)
+
+    def read(self, upto: int, skip: Optional[set] = None):
+        """Read the data sequentially.
+        Args:
+            upto: the number of the data read after the call.
+            skip: indices which are already emitted.
+        """
+        reads, _ = self.plan
+        for idx in reads[self.loaded:upto]:
+            if skip is not None and idx in skip:
+                continue
+            path = self.speechset.indexer[idx]
+            start = time.perf_counter()
+            raw = self.speechset.preproc(path)
+            self.elapsed += time.perf_counter() - start
+            # file size if available, otherwise decoded audio
+            self.nbytes += os.path.getsize(path) \
+                if isinstance(path, str) and os.path.isfile(path) else raw[-1].nbytes
+            if self.speechset.augment is not None:
+                self.speechset.augment.epoch = self.epoch
+                raw, = self.speechset.augment([raw])
+            self.data[idx] = self.speechset.normalize(*raw)
+        self.loaded = max(self.loaded, upto)
+
+    def emit(self, k: int) -> Any:
+        """Emit the k-th datum of the epoch.
+        Args:
+            k: index of the emission.
+        Returns:
+            normalized datum.
+        """
+        _, emits = self.plan
+        self.read(min(self.buffer + k, len(emits)))
+        return self.data.pop(emits[k])
+
+    def prepare(self):
+        """Prepare the schedule and refill the buffer of the current position.
+        """
+        if self.plan is not None:
+            return
+        self.plan = self.schedule(self.epoch)
+        self.loaded, self.data = 0, {}
+        # refill the buffer without emitted ones
+        start = self.position * (self.batch or 1)
+        if start > 0:
+            _, emits = self.plan
+            self.read(min(self.buffer + start, len(emits)), set(emits[:start].tolist()))
+
+    def __iter__(self):
+        """Iterate the current epoch.
+        """
+        return self
+
+    def __next__(self) -> Any:
+        """Sampling.
+        Returns:
+            normalized data.
+        """
+        if self.position >= len(self):
+            # prepare the next epoch
+            self.epoch += 1
+            self.position = 0
+            self.plan = None
+            raise StopIteration
+        self.prepare()
+        if self.batch is None:
+            datum = self.emit(self.position)
+        else:
+            start = self.position * self.batch
+            end = min(start + self.batch, len(self.speechset))
+            datum = self.speechset.collate([self.emit(k) for k in range(start, end)])
+        self.position += 1
+        return datum
+
+    def report(self) -> Dict[str, float]:
+        """Report the achieved read bandwidth.
+        Returns:
+            bytes: the number of the bytes read.
+            seconds: time spent on reading.
+            bandwidth: read bandwidth in MB/s.
+        """
+        return {
+            'bytes': self.nbytes,
+            'seconds': self.elapsed,
+            'bandwidth': self.nbytes / max(self.elapsed, 1e-9) / (1024 ** 2)}
+
+    def state_dict(self) -> Dict[str, Any]:
+        """Serializable state of the iterator.
+        Returns:
+            state of the iterator.
+        """
+        return {
+            'epoch': self.epoch,
+            'position': self.position,
+            'sampler': {
+                'batch': self.batch,
+                'block': self.block,
+                'buffer': self.buffer,
+                'seed': self.seed,
+                'drop_last': self.drop_last}}
+
+    def load_state_dict(self, state: Dict[str, Any]):
+        """Restore the state, only data remaining in the buffer are re-read.
+        Args:
+            state: state of the iterator.
+        """
+        self.epoch = state['epoch']
+        self.position = state['position']
+        for key, value in state['sampler'].items():
+            setattr(self, key, value)
+        self.plan = None
@@ -1,8 +1,13 @@
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
-from typing import Any, List, Union
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 import numpy as np
 
+from .pipeline import Pipeline
+from .sampler import Sampler
 from ..datasets import DataReader
 
 
@@ -15,6 +20,20 @@ class SpeechSet:
         self.reader = reader
         self.dataset, self.preproc = reader.dataset(), reader.preproc()
         self.indexer = list(self.dataset.keys())
+        # optional augmentation between preprocessor and normalizer
+        self.augment = None
+
+    def fetch(self, paths: List[str]) -> List[Tuple[int, str, np.ndarray]]:
+        """Read and augment the raw data.
+        Args:
+            paths: list of the paths.
+        Returns:
+            list of the raw data, speaker id, transcription and speech signal.
+        """
+        raw = [self.preproc(path) for path in paths]
+        if self.augment is not None:
+            raw = self.augment(raw)
+        return raw
 
     def normalize(self, sid: int, text: str, speech: np.ndarray) -> Any:
         """Normalizer.
@@ -36,6 +55,51 @@ class SpeechSet:
         """
         raise NotImplementedError('SpeechSet.collate is not implemented')
 
+    def allocate(self, shape: Tuple[int, ...], dtype: np.dtype) -> np.ndarray:
+        """Allocate the zero-initialized buffer for collation.
+        Loaders may replace it to collate directly into the preallocated memory.
+        Args:
+            shape: shape of the buffer.
+            dtype: data type of the buffer.
+        Returns:
+            zero-filled buffer.
+        """
+        return np.zeros(shape, dtype=dtype)
+
+    def pack(self,
+             items: List[np.ndarray],
+             dtype: np.dtype,
+             fill: Optional[Callable[[np.ndarray, np.ndarray], Any]] = None,
+             segment_ids: bool = False) -> Tuple[np.ndarray, ...]:
+        """Concatenate the sequences into the single preallocated buffer, without padding.
+        Args:
+            items: B x [np.float32; [Ti, ...]], sequences.
+            dtype: data type of the buffer.
+            fill: writer of the sequence into the slice of the buffer,
+                eg. in-place dtype conversion, plain assignment if not provided.
+            segment_ids: whether provide the segment ids or not.
+        Returns:
+            [dtype; [sum(Ti), ...]], packed sequences.
+            [np.int32; [B + 1]], cumulative sequence offsets.
+            (optional) [np.int32; [sum(Ti)]], index of the sequence for each timestep.
+        """
+        # [B + 1]
+        cu_seqlens = self.allocate([len(items) + 1], np.int32)
+        np.cumsum([len(item) for item in items], out=cu_seqlens[1:])
+        # [sum(Ti), ...]
+        packed = self.allocate([cu_seqlens[-1], *items[0].shape[1:]], dtype)
+        for item, start, end in zip(items, cu_seqlens[:-1], cu_seqlens[1:]):
+            if fill is None:
+                packed[start:end] = item
+            else:
+                fill(item, packed[start:end])
+        if not segment_ids:
+            return packed, cu_seqlens
+        # [sum(Ti)]
+        segments = self.allocate([cu_seqlens[-1]], np.int32)
+        segments[...] = np.repeat(np.arange(len(items), dtype=np.int32), np.diff(cu_seqlens))
+        return packed, cu_seqlens, segments
+
     def split(self, size: int):
         """Split dataset.
         WARNING: safety of this method is guaranteed by `copy.deepcopy`.
@@ -49,22 +113,69 @@ class SpeechSet:
         self.indexer = self.indexer[:size]
         return residual
 
-    def __getitem__(self, index: Union[int, slice]) -> Any:
+    def __getitem__(self, index: Union[int, slice, List[int]]) -> Any:
         """Lazy normalizing.
         Args:
-            index: input index.
+            index: input index, slice or list of indices.
         Returns:
             normalized inputs.
         """
         # reading data
-        raw = self.indexer[index]
-        if isinstance(index, int):
-            return self.normalize(*self.preproc(raw))
+        if isinstance(index, (list, np.ndarray)):
+            raw = [self.indexer[i] for i in index]
+        else:
+            raw = self.indexer[index]
+        if isinstance(index, (int, np.integer)):
+            return self.featurize([self.preproc(raw)], single=True)
         # normalize for slice
-        norm = [self.normalize(*self.preproc(single)) for single in raw]
+        return self.featurize([self.preproc(single) for single in raw])
+
+    def featurize(self, raw: List[Tuple[int, str, np.ndarray]], single: bool = False) -> Any:
+        """Augment, normalize and collate the raw data.
+        Args:
+            raw: list of the raw data, speaker id, transcription and speech signal.
+            single: whether return the single normalized datum without collation.
+        Returns:
+            normalized datum if `single` is True, otherwise batch data.
+        """
+        if self.augment is not None:
+            raw = self.augment(raw)
+        norm = [self.normalize(*single) for single in raw]
+        if single:
+            return norm[0]
         # pack
         return self.collate(norm)
 
+    async def aget(self,
+                   index: Union[int, slice, List[int]],
+                   executor: Optional[ThreadPoolExecutor] = None) -> Any:
+        """Asynchronous indexing, read files on the executor.
+        Args:
+            index: input index, slice or list of indices.
+            executor: executor for file reads and featurization, loop default if not provided.
+        Returns:
+            normalized inputs, same as `__getitem__`.
+        """
+        loop = asyncio.get_running_loop()
+        single = isinstance(index, (int, np.integer))
+        if isinstance(index, (list, np.ndarray)):
+            paths = [self.indexer[i] for i in index]
+        else:
+            paths = [self.indexer[index]] if single else self.indexer[index]
+        raw = await asyncio.gather(*[
+            loop.run_in_executor(executor, self.preproc, path) for path in paths])
+        return await loop.run_in_executor(executor, self.featurize, list(raw), single)
+
+    def pipeline(self):
+        """Construct lazy transform pipeline over the normalized data.
+        Returns:
+            Pipeline, pipeline of the normalized data with default collator.
+        """
+        return Pipeline(
+            self.indexer,
+            lambda path: self.normalize(*self.fetch([path])[0]),
+            self.collate)
+
     def __iter__(self):
         """Construct iterator.
         Returns:
@@ -72,6 +183,47 @@ class SpeechSet:
         """
         return SpeechSet.Iterator(self)
 
+    def iterate(self,
+                sampler: Optional[Sampler] = None,
+                state: Optional[Dict[str, Any]] = None):
+        """Construct resumable iterator.
+        Args:
+            sampler: index sampler, sequential single datum if not provided.
+            state: iterator state, reference `SpeechSet.Iterator.state_dict`.
+        Returns:
+            SpeechSet.Iterator, sampler-based iterator.
+        """
+        iterator = SpeechSet.Iterator(self, sampler)
+        if state is not None:
+            iterator.load_state_dict(state)
+        return iterator
+
+    def __aiter__(self):
+        """Construct asynchronous iterator.
+        Returns:
+            SpeechSet.AsyncIterator, index-based asynchronous iterator.
+        """
+        return SpeechSet.AsyncIterator(self)
+
+    def aiterate(self,
+                 sampler: Optional[Sampler] = None,
+                 state: Optional[Dict[str, Any]] = None,
+                 concurrency: int = 16,
+                 workers: int = 1):
+        """Construct resumable asynchronous iterator.
+        Args:
+            sampler: index sampler, sequential single datum if not provided.
+            state: iterator state, reference `SpeechSet.Iterator.state_dict`.
+            concurrency: maximum number of the outstanding file reads.
+            workers: the number of the featurization threads.
+        Returns:
+            SpeechSet.AsyncIterator, sampler-based asynchronous iterator.
+        """
+        iterator = SpeechSet.AsyncIterator(self, sampler, concurrency, workers)
+        if state is not None:
+            iterator.load_state_dict(state)
+        return iterator
+
     def __len__(self) -> int:
         """Return length of the dataset.
         Returns:
@@ -80,25 +232,165 @@ class SpeechSet:
         return len(self.indexer)
 
     class Iterator:
-        """Index-based iterator.
+        """Sampler-based iterator, resumable with the serializable state.
+        Iterator stops at the end of each epoch and continues with the next epoch.
         """
-        def __init__(self, speechset):
+        def __init__(self, speechset, sampler: Optional[Sampler] = None):
             """Initializer.
             Args:
                 speechset: SpeechSet, dataset.
+                sampler: index sampler, sequential single datum if not provided.
             """
             self.speechset = speechset
-            self.index = 0
-        
+            self.sampler = sampler or Sampler(len(speechset), shuffle=False)
+            self.epoch = 0
+            self.position = 0
+
+        def __iter__(self):
+            """Iterate the current epoch.
+            """
+            return self
+
         def __next__(self) -> Any:
             """Sampling.
             Returns:
                 normalized data.
             """
-            if self.index >= len(self.speechset):
+            if self.position >= len(self.sampler):
+                # prepare the next epoch
+                self.epoch += 1
+                self.position = 0
                 raise StopIteration
+            if self.speechset.augment is not None:
+                self.speechset.augment.epoch = self.epoch
             # sampling
-            datum = self.speechset[self.index]
+            datum = self.speechset[self.sampler.indices(self.epoch, self.position)]
             # successor
-            self.index += 1
+            self.position += 1
             return datum
+
+        def state_dict(self) -> Dict[str, Any]:
+            """Serializable state of the iterator.
+            Returns:
+                state, epoch, position of the next unseen step and the sampler state.
+            """
+            return {
+                'epoch': self.epoch,
+                'position': self.position,
+                'sampler': self.sampler.state_dict()}
+
+        def load_state_dict(self, state: Dict[str, Any]):
+            """Restore the state, jump to the next unseen step without sampling.
+            Args:
+                state: state of the iterator.
+            """
+            self.epoch = state['epoch']
+            self.position = state['position']
+            self.sampler.load_state_dict(state['sampler'])
+
+    class AsyncIterator(Iterator):
+        """Asynchronous sampler-based iterator.
+        File reads of the upcoming steps are issued ahead on the bounded executor,
+        overlapping with the featurization of the current step.
+        It yields exactly the same data as `SpeechSet.Iterator`.
+        """
+        def __init__(self,
+                     speechset,
+                     sampler: Optional[Sampler] = None,
+                     concurrency: int = 16,
+                     workers: int = 1):
+            """Initializer.
+            Args:
+                speechset: SpeechSet, dataset.
+                sampler: index sampler, sequential single datum if not provided.
+                concurrency: maximum number of the outstanding file reads.
+                workers: the number of the featurization threads.
+            """
+            super().__init__(speechset, sampler)
+            self.concurrency = concurrency
+            self.workers = workers
+            self.readers, self.featurizers = None, None
+            # outstanding reads, (step, futures)
+            self.pending = deque()
+
+        def __aiter__(self):
+            """Iterate the current epoch.
+            """
+            return self
+
+        def schedule(self, loop: asyncio.AbstractEventLoop):
+            """Issue the file reads of the upcoming steps.
+            Args:
+                loop: running event loop.
+            """
+            if self.readers is None:
+                self.readers = ThreadPoolExecutor(self.concurrency)
+                self.featurizers = ThreadPoolExecutor(self.workers)
+            step = self.pending[-1][0] + 1 if self.pending else self.position
+            outstanding = sum(len(futures) for _, futures in self.pending)
+            while step < len(self.sampler) \
+                    and (outstanding < self.concurrency or not self.pending):
+                indices = self.sampler.indices(self.epoch, step)
+                if isinstance(indices, (int, np.integer)):
+                    indices = [indices]
+                futures = [
+                    loop.run_in_executor(
+                        self.readers, self.speechset.preproc, self.speechset.indexer[i])
+                    for i in indices]
+                self.pending.append((step, futures))
+                outstanding += len(futures)
+                step += 1
+
+        async def __anext__(self) -> Any:
+            """Sampling.
+            Returns:
+                normalized data.
+            """
+            if self.position >= len(self.sampler):
+                # prepare the next epoch
+                self.epoch += 1
+                self.position = 0
+                self.close()
+                raise StopAsyncIteration
+            loop = asyncio.get_running_loop()
+            self.schedule(loop)
+            _, futures = self.pending.popleft()
+            raw = await asyncio.gather(*futures)
+            single = isinstance(
+                self.sampler.indices(self.epoch, self.position), (int, np.integer))
+            # successor, issue the next reads before featurization
+            self.position += 1
+            self.schedule(loop)
+            if self.speechset.augment is not None:
+                self.speechset.augment.epoch = self.epoch
+            return await loop.run_in_executor(
+                self.featurizers, self.speechset.featurize, list(raw), single)
+
+        def load_state_dict(self, state: Dict[str, Any]):
+            """Restore the state and drop the outstanding reads.
+            Args:
+                state: state of the iterator.
+            """
+            super().load_state_dict(state)
+            self.pending.clear()
+
+        def close(self):
+            """Release the executors.
+            """
+            self.pending.clear()
+            if self.readers is not None:
+                self.readers.shutdown(wait=False)
+                self.featurizers.shutdown(wait=False)
+                self.readers, self.featurizers = None, None
+
+        async def aclose(self):
+            """Release the executors if the consumer stops early, eg. `break`.
+            """
+            self.close()
+
+        def __del__(self):
+            """Release the executors on garbage collection.
+            """
+            # partially initialized
+            if getattr(self, 'pending', None) is not None:
+                self.close()
@@ -1,28 +1,43 @@
-from typing import List, Tuple
+import copy
+from typing import List, Optional, Tuple
 
 import numpy as np
 
 from .speechset import SpeechSet
 from ..config import Config
 from ..datasets import DataReader
-from ..utils import MelSTFT
+from ..utils import MelSTFT, MultiMelSTFT, Precision
 
 
 class VocoderDataset(SpeechSet):
     """Dataset for acoustic features to audio signal.
     """
-    def __init__(self, rawset: DataReader, config: Config):
+    def __init__(self,
+                 rawset: DataReader,
+                 config: Config,
+                 aux_configs: Optional[List[Config]] = None):
         """Initializer.
         Args:
             rawset: file-format datum reader.
             config: configuration.
+            aux_configs: auxiliary STFT configurations, eg. for multi-resolution losses.
+                features are casted with `config.dtype`, `dtype` of the auxiliaries is ignored.
         """
         super().__init__(rawset)
         self.config = config
+        self.aux_configs = aux_configs or []
+        self.precision = Precision(config)
         self.melstft = MelSTFT(config)
+        if self.aux_configs:
+            # auxiliary spectrograms in float32, casted once with `config.dtype` on collation
+            auxes = [copy.copy(aux_config) for aux_config in self.aux_configs]
+            for aux_config in auxes:
+                aux_config.dtype = 'float32'
+            # share the padded signal and filters across resolutions
+            self.multistft = MultiMelSTFT([config, *auxes])
 
     def normalize(self, sid: int, text: str, speech: np.ndarray) \
-            -> Tuple[np.ndarray, np.ndarray]:
+            -> Tuple[np.ndarray, ...]:
         """Normalize datum.
         Args:
             sid: speaker id.
@@ -30,33 +45,99 @@ class VocoderDataset(SpeechSet):
             speech: [np.float32; [T]], speech in range (-1, 1.)
         Returns:
             normalized datum.
-                mel: [np.float32; [T // hop + 1, mel]], mel spectrogram.
+                mel: [config.dtype; [T // hop + 1, mel]], mel spectrogram.
                 speech: [np.float32; [T]], speech signal.
+                *auxes: [np.float32; [T // aux_hop + 1, aux_mel]],
+                    mel spectrograms of auxiliary configurations.
         """
-        # [T // hop + 1, mel]
-        return self.melstft(speech), speech
+        if not self.aux_configs:
+            # [T // hop + 1, mel]
+            return self.melstft(speech), speech
+        mel, *auxes = self.multistft(speech)
+        return (mel, speech, *auxes)
 
-    def collate(self, bunch: List[Tuple[np.ndarray, np.ndarray]]) \
-            -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    def collate(self, bunch: List[Tuple[np.ndarray, ...]]) -> Tuple[np.ndarray, ...]:
         """Collate bunch of datum to the batch data.
         Args:
             bunch: B x [...] list of normalized inputs.
-                mel: [np.float32; [T // hop + 1, mel]], mel spectrogram.
+                mel: [config.dtype; [T // hop + 1, mel]], mel spectrogram.
                 speech: [np.float32; [T]], speech signal.
+                *auxes: [np.float32; [T // aux_hop + 1, aux_mel]],
+                    auxiliary mel spectrograms.
         Returns:
             batch data.
-                mel: [np.float32; [B, T // hop + 1, mel]], mel spectrogram.
-                speech: [np.float32; [B, T]], speech signal.
-                mellen: [np.long; [B]], spectrogram lengths.
-                speechlen: [np.long; [B]], signal lengths.
+                mel: [config.dtype; [B, T // hop + 1, mel]], mel spectrogram.
+                speech: [config.dtype; [B, T]], speech signal.
+                mellen: [config.label_dtype; [B]], spectrogram lengths.
+                speechlen: [config.label_dtype or np.int32; [B]], signal lengths, at least int32.
+                *auxes: pairs of the auxiliary mel spectrograms and their lengths,
+                    [config.dtype; [B, T // aux_hop + 1, aux_mel]], [config.label_dtype; [B]].
+            if `config.packed` is True, reference `VocoderDataset.collate_packed`.
         """
+        if self.config.packed:
+            return self.collate_packed(bunch)
         # [B], [B]
-        mellen, speechlen = np.array(
-            [[len(spec), len(signal)] for spec, signal in bunch], dtype=np.long).T
+        mellen = self.precision.lengths([len(spec) for spec, *_ in bunch])
+        speechlen = self.precision.samples([len(signal) for _, signal, *_ in bunch])
         # [B, T, mel]
-        mel = np.stack(
-            [np.pad(spec, [[0, mellen.max() - len(spec)], [0, 0]]) for spec, _ in bunch])
+        mel = self.collate_mel([spec for spec, *_ in bunch], mellen)
         # [B, S]
-        speech = np.stack(
-            [np.pad(signal, [0, speechlen.max() - len(signal)]) for _, signal in bunch])
-        return mel, speech, mellen, speechlen
+        speech = self.allocate([len(bunch), speechlen.max()], self.precision.feature)
+        for i, (_, signal, *_) in enumerate(bunch):
+            # cast in place while filling
+            self.precision.cast(signal, out=speech[i, :len(signal)])
+
+        auxes = []
+        for j in range(len(self.aux_configs)):
+            specs = [auxes_[j] for _, _, *auxes_ in bunch]
+            # [B]
+            auxlen = self.precision.lengths([len(spec) for spec in specs])
+            auxes.extend([self.collate_mel(specs, auxlen), auxlen])
+        return (mel, speech, mellen, speechlen, *auxes)
+
+    def collate_mel(self, specs: List[np.ndarray], lengths: np.ndarray) -> np.ndarray:
+        """Collate mel spectrograms.
+        Args:
+            specs: B x [np.float32 or config.dtype; [Ti, mel]], mel spectrograms.
+            lengths: [config.label_dtype; [B]], spectrogram lengths.
+        Returns:
+            [config.dtype; [B, T, mel]], padded spectrograms.
+        """
+        # [B, T, mel]
+        mel = self.allocate(
+            [len(specs), lengths.max(), specs[0].shape[-1]], self.precision.feature)
+        for i, spec in enumerate(specs):
+            self.precision.cast(spec, out=mel[i, :len(spec)])
+        return mel
+
+    def collate_packed(self, bunch: List[Tuple[np.ndarray, ...]]) -> Tuple[np.ndarray, ...]:
+        """Collate bunch of datum to the packed batch data, without padding.
+        Args:
+            bunch: B x [...] list of normalized inputs, same as `VocoderDataset.collate`.
+        Returns:
+            packed batch data.
+                mel: [config.dtype; [sum(T // hop + 1), mel]], mel spectrogram.
+                speech: [config.dtype; [sum(T)]], speech signal.
+                cu_mellens: [np.int32; [B + 1]], cumulative spectrogram lengths.
+                cu_speechlens: [np.int32; [B + 1]], cumulative signal lengths.
+                *auxes: pairs of the packed auxiliary mel spectrograms and their offsets,
+                    [config.dtype; [sum(T // aux_hop + 1), aux_mel]], [np.int32; [B + 1]].
+                if `config.segment_ids` is True, additionally,
+                    [np.int32; [sum(...)]], segment ids of mel, speech and auxes in order.
+        """
+        segment_ids = self.config.segment_ids
+
+        def fill(feature: np.ndarray, out: np.ndarray):
+            # cast in place while filling
+            self.precision.cast(feature, out=out)
+
+        packs = [
+            self.pack(
+                [datum[k] for datum in bunch], self.precision.feature,
+                fill=fill, segment_ids=segment_ids)
+            for k in range(len(bunch[0]))]
+        (mel, cu_mellens, *melseg), (speech, cu_speechlens, *speechseg), *auxes = packs
+        return (
+            mel, speech, cu_mellens, cu_speechlens,
+            *[x for aux, cu_auxlens, *_ in auxes for x in (aux, cu_auxlens)],
+            *melseg, *speechseg, *[x for _, _, *auxseg in auxes for x in auxseg])
@@ -1,13 +1,26 @@
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 import numpy as np
 
 from .speechset import SpeechSet
+from ..config import Config
+from ..datasets import DataReader
+from ..utils import Precision
 
 
 class WavDataset(SpeechSet):
     """Waveform only dataset.
     """
+    def __init__(self, rawset: DataReader, config: Optional[Config] = None):
+        """Initializer.
+        Args:
+            rawset: file-format datum reader.
+            config: configuration for the output dtypes, float32 and int64 if not provided.
+        """
+        super().__init__(rawset)
+        self.config = config or Config()
+        self.precision = Precision(self.config)
+
     def normalize(self, sid: int, text: str, speech: np.ndarray) -> np.ndarray:
         """Normalize datum.
         Args:
@@ -19,20 +32,30 @@ class WavDataset(SpeechSet):
         """
         return speech
 
-    def collate(self, bunch: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    def collate(self, bunch: List[np.ndarray]) -> Tuple[np.ndarray, ...]:
         """Collate bunch of datum to the batch data.
         Args:
             bunch: B x [np.float32; [T]], speech signal.
         Returns:
             batch data.
-                speeches: [np.float32; [B, T]], speech signal.
-                lengths: [np.long; [B]], speech lengths.
+                speeches: [config.dtype; [B, T]], speech signal.
+                lengths: [config.label_dtype or np.int32; [B]], speech lengths, at least int32.
+            if `config.packed` is True,
+                speeches: [config.dtype; [sum(T)]], packed speech signal.
+                cu_seqlens: [np.int32; [B + 1]], cumulative speech lengths.
+                (optional) segments: [np.int32; [sum(T)]], segment ids,
+                    if `config.segment_ids` is True.
         """
+        if self.config.packed:
+            return self.pack(
+                bunch, self.precision.feature,
+                fill=lambda signal, out: self.precision.cast(signal, out=out),
+                segment_ids=self.config.segment_ids)
         # [B]
-        lengths = np.array([len(s) for s in bunch])
-        # []
-        maxlen = lengths.max()
+        lengths = self.precision.samples([len(s) for s in bunch])
         # [B, T]
-        speeches = np.stack([
-            np.pad(signal, [0, maxlen - len(signal)]) for signal in bunch])
+        speeches = self.allocate([len(bunch), lengths.max()], self.precision.feature)
+        for i, signal in enumerate(bunch):
+            # cast in place while filling
+            self.precision.cast(signal, out=speeches[i, :len(signal)])
         return speeches, lengths
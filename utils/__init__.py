@@ -1,4 +1,13 @@
 from .dump import DumpReader
-from .melstft import MelSTFT
+from .melstft import MelSTFT, MultiMelSTFT
 from .normalizer import TextNormalizer
 from .wrapper import IDWrapper
+from .loader import SharedMemoryLoader
+from .trimmer import SilenceTrimmer
+from .pitch import PitchEstimator
+from .augment import Augment
+from .precision import Precision
+from .resample import PolyphaseResampler
+from .serving import ServingFeaturizer
+from .stats import DatasetStats
+from .autotune import Autotune
@@ -0,0 +1,125 @@
+import zlib
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .resample import PolyphaseResampler
+
+
+class Augment:
+    """Batched on-the-fly augmentation, speed perturbation, additive noise and gain.
+    Applied between `DataReader.preproc` and `SpeechSet.normalize`.
+    Random parameters of each datum are derived from the seed, epoch and its content,
+    so that they do not depend on the worker, thread or the order of the calls.
+    """
+    def __init__(self,
+                 speeds: Optional[List[float]] = None,
+                 noise: Optional[str] = None,
+                 snr: Tuple[float, float] = (5., 20.),
+                 gain: Optional[Tuple[float, float]] = None,
+                 seed: int = 0):
+        """Initializer.
+        Args:
+            speeds: candidates of the speed factors, no speed perturbation if not provided.
+            noise: path to the noise bank, single `.npy` file of [np.float32; [N]] signal,
+                no additive noise if not provided.
+            snr: range of the signal-to-noise ratio in decibels.
+            gain: range of the random gain in decibels, no gain if not provided.
+            seed: random seed.
+        """
+        self.speeds = speeds
+        self.noise = noise
+        self.snr = snr
+        self.gain = gain
+        self.seed = seed
+        # current epoch, updated by the iterators and loaders
+        self.epoch = 0
+        self.resampler = PolyphaseResampler()
+        # lazy memory-mapped noise bank
+        self.bank = None
+
+    def __getstate__(self):
+        """Do not pickle the memory-mapped noise bank.
+        """
+        state = self.__dict__.copy()
+        state['bank'] = None
+        return state
+
+    def noisebank(self) -> np.ndarray:
+        """Open the noise bank on the first use.
+        Returns:
+            [np.float32; [N]], memory-mapped noise signal.
+        """
+        if self.bank is None:
+            self.bank = np.load(self.noise, mmap_mode='r')
+        return self.bank
+
+    def generator(self, text: str, audio: np.ndarray) -> np.random.Generator:
+        """Random generator of the datum.
+        Args:
+            text: transcription.
+            audio: [np.float32; [T]], audio signal.
+        Returns:
+            generator seeded by the seed, epoch and the content hash.
+        """
+        key = zlib.crc32(np.ascontiguousarray(audio).tobytes(), zlib.crc32(text.encode()))
+        return np.random.default_rng([self.seed, self.epoch, key])
+
+    def perturb(self, audio: np.ndarray, speed: float) -> np.ndarray:
+        """Speed perturbation with cached polyphase filter of the ratio.
+        Args:
+            audio: [np.float32; [T]], audio signal.
+            speed: speed factor.
+        Returns:
+            [np.float32; [T / speed]], perturbed.
+        """
+        # resample from speed x sr to sr
+        up, down = self.resampler.ratio(1, 1 / speed)
+        return self.resampler.resample(audio, up, down)
+
+    def __call__(self, bunch: List[Tuple[int, str, np.ndarray]]) \
+            -> List[Tuple[int, str, np.ndarray]]:
+        """Augment the bunch of the raw data.
+        Args:
+            bunch: B x [...], list of the raw data.
+                sid: speaker id.
+                text: transcription.
+                audio: [np.float32; [T]], audio signal.
+        Returns:
+            augmented bunch.
+        """
+        if len(bunch) == 0:
+            return bunch
+        audios = [audio for _, _, audio in bunch]
+        rngs = [self.generator(text, audio) for _, text, audio in bunch]
+        if self.speeds:
+            speeds = [rng.choice(self.speeds) for rng in rngs]
+            audios = [self.perturb(audio, speed) for audio, speed in zip(audios, speeds)]
+        # [B]
+        lengths = np.array([len(audio) for audio in audios])
+        # [B + 1]
+        starts = np.concatenate([[0], np.cumsum(lengths)])
+        # [sum(T)], flattened batch
+        flat = np.concatenate(audios).astype(np.float32)
+        if self.noise is not None and len(flat) > 0:
+            bank = self.noisebank()
+            # [sum(T)], random offsets per utterance, wrapped around the bank
+            offsets = np.array([rng.integers(0, len(bank)) for rng in rngs])
+            index = np.arange(len(flat)) - np.repeat(starts[:-1] - offsets, lengths)
+            index %= len(bank)
+            noise = np.asarray(bank[index], dtype=np.float32)
+            # [B], mean power of the signals and the noises
+            segments = starts[:-1].clip(max=max(len(flat) - 1, 0))
+            power = np.add.reduceat(flat ** 2, segments) / np.maximum(lengths, 1)
+            npower = np.add.reduceat(noise ** 2, segments) / np.maximum(lengths, 1)
+            # [B]
+            snr = np.array([rng.uniform(*self.snr) for rng in rngs])
+            scale = np.sqrt(power / np.maximum(npower, 1e-10) / 10 ** (snr / 10))
+            flat += noise * np.repeat(scale, lengths).astype(np.float32)
+        if self.gain is not None:
+            # [B]
+            gain = 10 ** (np.array([rng.uniform(*self.gain) for rng in rngs]) / 20)
+            flat *= np.repeat(gain, lengths).astype(np.float32)
+        return [
+            (sid, text, flat[start:end])
+            for (sid, text, _), start, end in zip(bunch, starts[:-1], starts[1:])]
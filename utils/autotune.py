@@ -0,0 +1,459 @@
+import asyncio
+import copy
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import socket
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .loader import SharedMemoryLoader
+from ..datasets import DataReader
+from ..speeches.sampler import Sampler
+from ..speeches.speechset import SpeechSet
+
+
+class Autotune:
+    """Per-host calibration of the worker count, shared memory slots, batch size and prefetch depth
+    for the dataset iteration, and the process pool for `DumpReader.dump`.
+    Settings are cached on `~/.cache/speechset/autotune-{hostname}.json`
+    and reused by the later runs on the same host, data and configurations.
+    """
+    MB = 1024 * 1024
+
+    def __init__(self,
+                 ram_budget: Optional[int] = None,
+                 path: Optional[str] = None,
+                 samples: int = 64,
+                 steps: int = 8,
+                 seed: int = 0):
+        """Initializer.
+        Args:
+            ram_budget: memory budget for the loader in bytes, half of the available memory default.
+            path: path to the settings cache, per-host file on the user cache directory default.
+            samples: the number of the data for calibration.
+            steps: the number of the batches per worker for the loader calibration.
+            seed: random seed for sampling the calibration data.
+        """
+        self.ram_budget = ram_budget or Autotune.available() // 2
+        self.path = path or os.path.join(
+            os.path.expanduser('~'), '.cache', 'speechset',
+            f'autotune-{socket.gethostname()}.json')
+        self.samples = samples
+        self.steps = steps
+        self.seed = seed
+
+    @staticmethod
+    def available() -> int:
+        """Available physical memory.
+        Returns:
+            available memory in bytes, 4GB if unknown.
+        """
+        try:
+            return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+        except (AttributeError, ValueError, OSError):
+            return 4 * 1024 * Autotune.MB
+
+    @staticmethod
+    def nbytes(outputs: Any) -> int:
+        """Size of the collated outputs.
+        Args:
+            outputs: collated batch.
+        Returns:
+            total bytes of the arrays.
+        """
+        if isinstance(outputs, np.ndarray):
+            return outputs.nbytes
+        if isinstance(outputs, (list, tuple)):
+            return sum(Autotune.nbytes(output) for output in outputs)
+        return 0
+
+    def subset(self, speechset: SpeechSet) -> SpeechSet:
+        """Random subset of the dataset for calibration.
+        Args:
+            speechset: dataset.
+        Returns:
+            shallow copy of the dataset with sampled indexer.
+        """
+        rng = np.random.default_rng(self.seed)
+        size = min(self.samples, len(speechset))
+        subset = copy.copy(speechset)
+        subset.indexer = [
+            speechset.indexer[i]
+            for i in sorted(rng.choice(len(speechset), size, replace=False))]
+        return subset
+
+    def measure(self, speechset: SpeechSet, batch: int) -> Dict[str, float]:
+        """Measure the per-stage costs on the single process.
+        Args:
+            speechset: calibration dataset.
+            batch: size of the batch.
+        Returns:
+            decode: seconds per datum for reading.
+            featurize: seconds per datum for augmentation and normalization.
+            collate: seconds per datum for collation.
+            bytes: bytes per datum of the collated outputs.
+            peak: bytes of the largest datum collated alone.
+        """
+        decode, featurize, collate, nbytes, peak = 0., 0., 0., 0, 0
+        for i in range(0, len(speechset), batch):
+            start = time.perf_counter()
+            raw = [speechset.preproc(path) for path in speechset.indexer[i:i + batch]]
+            mid = time.perf_counter()
+            if speechset.augment is not None:
+                raw = speechset.augment(raw)
+            norm = [speechset.normalize(*datum) for datum in raw]
+            end = time.perf_counter()
+            outputs = speechset.collate(norm)
+            collate += time.perf_counter() - end
+            decode += mid - start
+            featurize += end - mid
+            nbytes += Autotune.nbytes(outputs)
+            # batch of the padded outputs is bounded by the batch of the largest datum
+            peak = max([peak, *[Autotune.nbytes(speechset.collate([datum])) for datum in norm]])
+        size = max(len(speechset), 1)
+        return {
+            'decode': decode / size,
+            'featurize': featurize / size,
+            'collate': collate / size,
+            'bytes': nbytes / size,
+            'peak': peak}
+
+    def throughput(self, speechset: SpeechSet, batch: int, workers: int, slot_size: int) -> float:
+        """Measure the loader throughput.
+        Args:
+            speechset: calibration dataset.
+            batch: size of the batch.
+            workers: the number of the workers.
+            slot_size: size of the shared memory slot.
+        Returns:
+            data per second.
+        """
+        loader = SharedMemoryLoader(speechset, batch, workers, slot_size=slot_size)
+        steps = min(len(loader), self.steps * workers)
+        iterator = iter(loader)
+        try:
+            # exclude the process startup
+            next(iterator).release()
+            start = time.perf_counter()
+            for _, outputs in zip(range(steps - 1), iterator):
+                outputs.release()
+            elapsed = time.perf_counter() - start
+        finally:
+            iterator.close()
+        return (steps - 1) * batch / max(elapsed, 1e-9)
+
+    def depth(self, speechset: SpeechSet, batch: int, concurrency: int) -> float:
+        """Measure the throughput of the asynchronous iteration.
+        Args:
+            speechset: calibration dataset.
+            batch: size of the batch.
+            concurrency: the number of the outstanding reads.
+        Returns:
+            data per second.
+        """
+        sampler = Sampler(len(speechset), batch, shuffle=False)
+        steps = min(len(sampler), self.steps)
+
+        async def run() -> float:
+            iterator = SpeechSet.AsyncIterator(speechset, sampler, concurrency=concurrency)
+            try:
+                start = time.perf_counter()
+                for _ in range(steps):
+                    await iterator.__anext__()
+                return time.perf_counter() - start
+            finally:
+                await iterator.aclose()
+
+        return steps * batch / max(asyncio.run(run()), 1e-9)
+
+    @staticmethod
+    def decoder(args: Tuple[str, Any]):
+        """Read the datum, multiprocessing purpose.
+        Args:
+            path: str, path to the datum.
+            preproc: Callable, preprocessor of the reader.
+        """
+        path, preproc = args
+        preproc(path)
+
+    def pool(self, args: List[Tuple[str, Any]], num_proc: int, chunksize: int) -> float:
+        """Measure the throughput of the process pool.
+        Args:
+            args: arguments of `Autotune.decoder`.
+            num_proc: the number of the processes.
+            chunksize: size of the imap_unordered chunk.
+        Returns:
+            data per second.
+        """
+        with mp.Pool(num_proc) as pool:
+            # exclude the process startup
+            pool.map(Autotune.decoder, args[:num_proc], chunksize=1)
+            start = time.perf_counter()
+            for _ in pool.imap_unordered(Autotune.decoder, args, chunksize=chunksize):
+                pass
+            elapsed = time.perf_counter() - start
+        return len(args) / max(elapsed, 1e-9)
+
+    def calibrate_dump(self, reader: DataReader) -> Dict[str, Any]:
+        """Run the calibration passes for `DumpReader.dump`.
+        Args:
+            reader: dataset reader to dump.
+        Returns:
+            settings, `num_proc` and `chunksize` of `DumpReader.dump` with the measurements.
+        """
+        rng = np.random.default_rng(self.seed)
+        paths = list(reader.dataset())
+        paths = [
+            paths[i]
+            for i in sorted(rng.choice(len(paths), min(self.samples, len(paths)), replace=False))]
+        preproc = reader.preproc()
+        start = time.perf_counter()
+        for path in paths:
+            preproc(path)
+        decode = (time.perf_counter() - start) / max(len(paths), 1)
+        # amortize the inter-process communication over about 50ms chunks
+        chunksize = int(np.clip(0.05 / max(decode, 1e-6), 1, 256))
+
+        cpus = os.cpu_count() or 1
+        candidates = sorted({min(2 ** i, cpus) for i in range(cpus.bit_length() + 1)})
+        # repeat the samples to cover the chunks of the largest candidate
+        size = self.steps * max(candidates) * chunksize
+        args = [(path, preproc) for path in paths] * -(-size // max(len(paths), 1))
+        rates = {
+            num_proc: self.pool(args[:size], num_proc, chunksize)
+            for num_proc in candidates}
+        # smallest process count within 90% of the best
+        best = max(rates.values())
+        num_proc = min(n for n, rate in rates.items() if rate >= 0.9 * best)
+        return {
+            'num_proc': num_proc,
+            'chunksize': chunksize,
+            'measure': {'decode': decode, 'throughput': {str(n): r for n, r in rates.items()}}}
+
+    def calibrate(self, speechset: SpeechSet, batch: int = 16) -> Dict[str, Any]:
+        """Run the calibration passes and pick the settings.
+        Args:
+            speechset: dataset.
+            batch: maximum size of the batch.
+        Returns:
+            settings, keyword arguments of `SharedMemoryLoader`,
+                `prefetch` for the `concurrency` of `SpeechSet.AsyncIterator`
+                and the `size` of `Pipeline.prefetch`, with the measurements.
+        """
+        subset = self.subset(speechset)
+        costs = self.measure(subset, batch)
+        cpus = os.cpu_count() or 1
+        # leave the single core for the consumer
+        candidates = sorted({min(2 ** i, max(cpus - 1, 1)) for i in range(cpus.bit_length())})
+
+        def slot(batch: int) -> int:
+            # batch of the largest datum, 1MB margin for the alignments
+            return int(-(-costs['peak'] * batch // Autotune.MB) + 1) * Autotune.MB
+
+        slot_size = slot(batch)
+        # repeat the samples to cover the largest candidate
+        steps = (self.steps * max(candidates) + 1) * batch
+        if len(subset) < steps:
+            subset.indexer = subset.indexer * -(-steps // max(len(subset), 1))
+        rates = {
+            workers: self.throughput(subset, batch, workers, slot_size)
+            for workers in candidates}
+        # smallest worker count within 90% of the best
+        best = max(rates.values())
+        workers = min(w for w, rate in rates.items() if rate >= 0.9 * best)
+
+        # shrink the batch until the slots fit in the budget
+        slots = 2 * workers
+        while batch > 1 and slots * slot_size > self.ram_budget:
+            batch //= 2
+            slot_size = slot(batch)
+
+        # outstanding reads of the asynchronous iteration, from a step up to 8 steps ahead
+        depths = {
+            concurrency: self.depth(subset, batch, concurrency)
+            for concurrency in [batch * 2 ** i for i in range(4)]}
+        best = max(depths.values())
+        prefetch = min(d for d, rate in depths.items() if rate >= 0.9 * best)
+        return {
+            'batch': batch,
+            'num_workers': workers,
+            'slots': slots,
+            'slot_size': slot_size,
+            'prefetch': prefetch,
+            'measure': {
+                **costs,
+                'throughput': {str(w): r for w, r in rates.items()},
+                'prefetch': {str(d): r for d, r in depths.items()}}}
+
+    @staticmethod
+    def key(speechset: SpeechSet, batch: int) -> str:
+        """Name of the settings, identify the data and the configurations.
+        Args:
+            speechset: dataset.
+            batch: maximum size of the batch.
+        Returns:
+            class names of the dataset and reader, batch size and the digest.
+        """
+        reader = speechset.reader
+        # configurations of the dataset or the tasks, eg. `MultiTaskDataset`
+        configs = [
+            vars(config)
+            for task in getattr(speechset, 'tasks', [speechset])
+            for config in [getattr(task, 'config', None), *getattr(task, 'aux_configs', [])]
+            if config is not None]
+        digest = Autotune.digest(reader, configs)
+        return f'{type(speechset).__name__}-{type(reader).__name__}-{batch}-{digest}'
+
+    @staticmethod
+    def digest(reader: DataReader, configs: Optional[List[Dict[str, Any]]] = None) -> str:
+        """Identify the data and the configurations.
+        Args:
+            reader: dataset reader.
+            configs: attributes of the configurations.
+        Returns:
+            digest of the identity.
+        """
+        dataset = reader.dataset()
+        identity = {
+            # readers without the data directory are identified by the first path
+            'data': os.path.abspath(getattr(reader, 'data_dir', None) or next(iter(dataset), '')),
+            'size': len(dataset),
+            'configs': configs or []}
+        return hashlib.sha1(
+            json.dumps(identity, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """Load the cached settings of the host.
+        Returns:
+            settings per key.
+        """
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path) as f:
+            return json.load(f)
+
+    def save(self, key: str, settings: Dict[str, Any]):
+        """Write the settings on the host cache.
+        Args:
+            key: name of the settings.
+            settings: calibrated settings.
+        """
+        cached = self.load()
+        cached[key] = settings
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'w') as f:
+            json.dump(cached, f, indent=2)
+
+    def __call__(self,
+                 speechset: SpeechSet,
+                 batch: int = 16,
+                 key: Optional[str] = None,
+                 force: bool = False) -> Dict[str, Any]:
+        """Load the cached settings or calibrate on the first run.
+        Args:
+            speechset: dataset.
+            batch: maximum size of the batch.
+            key: name of the settings, reference `Autotune.key` for default.
+            force: whether recalibrate even if the cached settings exist.
+        Returns:
+            settings, reference `Autotune.calibrate`.
+        """
+        key = key or Autotune.key(speechset, batch)
+        if not force:
+            settings = self.load().get(key, None)
+            if settings is not None:
+                return settings
+        settings = self.calibrate(speechset, batch)
+        self.save(key, settings)
+        return settings
+
+    def dump(self,
+             reader: DataReader,
+             key: Optional[str] = None,
+             force: bool = False) -> Dict[str, Any]:
+        """Load the cached settings of `DumpReader.dump` or calibrate on the first run.
+        Args:
+            reader: dataset reader to dump.
+            key: name of the settings, class name and the digest of the reader default.
+            force: whether recalibrate even if the cached settings exist.
+        Returns:
+            settings, reference `Autotune.calibrate_dump`.
+        """
+        key = key or f'dump-{type(reader).__name__}-{Autotune.digest(reader)}'
+        if not force:
+            settings = self.load().get(key, None)
+            if settings is not None:
+                return settings
+        settings = self.calibrate_dump(reader)
+        self.save(key, settings)
+        return settings
+
+    def loader(self, speechset: SpeechSet, batch: int = 16, **kwargs) -> SharedMemoryLoader:
+        """Construct the loader with the tuned settings.
+        Args:
+            speechset: dataset.
+            batch: maximum size of the batch.
+            kwargs: additional arguments of `SharedMemoryLoader`, eg. `sampler`.
+        Returns:
+            tuned loader.
+        """
+        settings = self(speechset, batch)
+        return SharedMemoryLoader(
+            speechset,
+            settings['batch'],
+            settings['num_workers'],
+            slots=settings['slots'],
+            slot_size=settings['slot_size'],
+            **kwargs)
+
+    def iterator(self,
+                 speechset: SpeechSet,
+                 batch: int = 16,
+                 sampler: Optional[Sampler] = None,
+                 **kwargs) -> SpeechSet.AsyncIterator:
+        """Construct the asynchronous iterator with the tuned settings.
+        Args:
+            speechset: dataset.
+            batch: maximum size of the batch.
+            sampler: index sampler, sequential batches of the tuned size if not provided.
+            kwargs: additional arguments of `SpeechSet.AsyncIterator`, eg. `workers`.
+        Returns:
+            tuned iterator.
+        """
+        settings = self(speechset, batch)
+        return SpeechSet.AsyncIterator(
+            speechset,
+            sampler or Sampler(len(speechset), settings['batch'], shuffle=False),
+            concurrency=settings['prefetch'],
+            **kwargs)
+
+
+if __name__ == '__main__':
+    def main():
+        import argparse
+        from .dump import DumpReader
+        from ..config import Config
+        from ..speeches import AcousticDataset, VocoderDataset
+        parser = argparse.ArgumentParser()
+        parser.add_argument('--data-dir', required=True)
+        parser.add_argument('--target', default='acoustic', choices=['acoustic', 'vocoder'])
+        parser.add_argument('--batch', default=16, type=int)
+        parser.add_argument('--ram-budget', default=None, type=int, help='in megabytes')
+        args = parser.parse_args()
+
+        reader = DumpReader(args.data_dir)
+        config = Config(args.batch)
+        config.sr = reader.sr
+        speechset = (AcousticDataset if args.target == 'acoustic' else VocoderDataset)(reader, config)
+        tuner = Autotune(None if args.ram_budget is None else args.ram_budget * Autotune.MB)
+        settings = tuner(speechset, args.batch, force=True)
+        for name, value in settings.items():
+            if name != 'measure':
+                print(f'[*] {name}: {value}')
+        print(f'[*] saved on {tuner.path}')
+
+    main()
@@ -0,0 +1,106 @@
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+
+# heavy modules which should not be loaded on package import
+HEAVY = ['librosa', 'numba', 'scipy', 'sklearn']
+
+
+def import_time(repeat: int = 5) -> Dict[str, object]:
+    """Measure the package import time on the fresh interpreters.
+    Args:
+        repeat: the number of the measurements.
+    Returns:
+        median: median of the import times in seconds.
+        heavy: list of the heavy modules loaded on import.
+    """
+    # root directory of the package
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parent, name = os.path.split(root)
+    code = (
+        'import sys, time\n'
+        f'sys.path.insert(0, {parent!r})\n'
+        'start = time.perf_counter()\n'
+        f'import {name}\n'
+        'print(time.perf_counter() - start)\n'
+        f'print(",".join(m for m in {HEAVY!r} if m in sys.modules))\n')
+    times, heavy = [], set()
+    for _ in range(repeat):
+        elapsed, loaded = subprocess.run(
+            [sys.executable, '-c', code],
+            check=True, capture_output=True, text=True).stdout.split('\n')[:2]
+        times.append(float(elapsed))
+        heavy.update(filter(None, loaded.split(',')))
+    return {'median': float(np.median(times)), 'heavy': sorted(heavy)}
+
+
+def serving_latency(seconds: List[float] = [1., 5., 10.],
+                    chars: List[int] = [50, 200],
+                    repeat: int = 200) -> Dict[str, Dict[str, float]]:
+    """Measure the latency of the serving featurizer.
+    Args:
+        seconds: lengths of the signals in seconds.
+        chars: lengths of the texts.
+        repeat: the number of the measurements per request size.
+    Returns:
+        p50 and p99 latencies in milliseconds for each request size.
+    """
+    from .serving import ServingFeaturizer
+    from ..config import Config
+    config = Config()
+    featurizer = ServingFeaturizer(config, int(max(seconds) * config.sr))
+    featurizer.warmup()
+
+    def measure(fn, arg) -> Dict[str, float]:
+        latencies = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn(arg)
+            latencies.append((time.perf_counter() - start) * 1000)
+        return {
+            'p50': float(np.percentile(latencies, 50)),
+            'p99': float(np.percentile(latencies, 99))}
+
+    rng = np.random.default_rng(0)
+    results = {}
+    for n in chars:
+        text = ''.join(rng.choice(list('abcdefghijklmnopqrstuvwxyz  ,.'), n))
+        results[f'labeling/{n}chars'] = measure(featurizer.labeling, text)
+    for sec in seconds:
+        signal = rng.uniform(-0.5, 0.5, int(sec * config.sr)).astype(np.float32)
+        results[f'mel/{sec:g}s'] = measure(featurizer.mel, signal)
+    return results
+
+
+if __name__ == '__main__':
+    def main():
+        import argparse
+        parser = argparse.ArgumentParser()
+        parser.add_argument('target', nargs='?', default='import', choices=['import', 'serving'])
+        parser.add_argument('--repeat', default=5, type=int)
+        parser.add_argument('--budget', default=0.5, type=float,
+                            help='maximum allowed import time in seconds')
+        args = parser.parse_args()
+
+        if args.target == 'serving':
+            for name, result in serving_latency(repeat=max(args.repeat, 100)).items():
+                print(f'[*] {name}: p50 {result["p50"]:.3f}ms, p99 {result["p99"]:.3f}ms')
+            return
+
+        failures: List[str] = []
+        result = import_time(args.repeat)
+        print(f'[*] import time: {result["median"] * 1000:.1f}ms, '
+              f'heavy modules: {result["heavy"] or "none"}')
+        if result['heavy']:
+            failures.append(f'heavy modules are loaded on import: {result["heavy"]}')
+        if result['median'] > args.budget:
+            failures.append(f'import time exceeds the budget {args.budget:.2f}s')
+        if failures:
+            sys.exit('\n'.join(failures))
+
+    main()
@@ -1,25 +1,38 @@
+import hashlib
 import multiprocessing as mp
 import json
 import os
-from typing import Callable, Dict, List, Optional, Tuple
+import shutil
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
-import librosa
 import numpy as np
 from tqdm import tqdm
 
+from .resample import PolyphaseResampler
+from .trimmer import SilenceTrimmer
 from .. import datasets
 
 
 class DumpReader(datasets.DataReader):
     """Dumped loader
     """
-    def __init__(self, data_dir: str, sr: Optional[int] = None):
+    # completion marker of the materialized dump
+    COMPLETE = 'COMPLETE'
+
+    def __init__(self,
+                 data_dir: str,
+                 sr: Optional[int] = None,
+                 materialize: bool = True,
+                 num_proc: Optional[int] = None):
         """Initializer.
         Args:
             data_dir: path to the mother directory.
             sr: target sampling rate.
+            materialize: whether write the resampled copy of the dump for the target sampling rate,
+                resample on every read with the cached polyphase filter if False.
+            num_proc: the number of the processes for materialization, the number of the cpus default.
         """
-        prev_sr, self.speakers_, self.transcript = self.load_data(data_dir)
+        prev_sr, self.speakers_, self.transcript, self.aliases = self.load_data(data_dir)
         assert not (sr is None and prev_sr is None), \
             'sampling rate not found, pass `sr` to the DumpReader'
 
@@ -35,6 +48,19 @@ class DumpReader(datasets.DataReader):
             sr = prev_sr
         # alias
         self.prev_sr, self.sr = prev_sr, sr
+        self.data_dir = data_dir
+
+        self.resampler = None
+        if prev_sr == sr:
+            self.mode = 'native'
+        elif materialize and self.materialize(num_proc):
+            self.mode = 'materialized'
+        else:
+            self.mode = 'polyphase'
+            self.resampler = PolyphaseResampler()
+        if self.mode != 'native':
+            print(f'[*] speechset.utils.dump.DumpReader: {self.mode} resampling, '
+                  f'{prev_sr}Hz to {sr}Hz')
 
     def dataset(self) -> Dict[str, Tuple[int, str]]:
         """Return file reader.
@@ -50,6 +76,116 @@ class DumpReader(datasets.DataReader):
         """
         return self.speakers_
 
+    def materialize(self, num_proc: Optional[int] = None) -> bool:
+        """Redirect the reads to the resampled copy of the dump, build it if not exists.
+        Args:
+            num_proc: the number of the processes, the number of the cpus default.
+        Returns:
+            whether the resampled copy is available or not.
+        """
+        target = os.path.join(self.data_dir, f'dumped-{self.sr}')
+        fingerprint = self.fingerprint()
+        if not DumpReader.completed(target, fingerprint):
+            try:
+                if os.path.exists(target):
+                    # resampled from the previous dump
+                    shutil.rmtree(target)
+                self.build(target, fingerprint, num_proc)
+            except OSError as e:
+                import warnings
+                warnings.warn(
+                    f'failed to materialize the dump on `{target}`({e})'
+                    ', fallback to the polyphase resampling on read')
+                return False
+        self.transcript = {
+            os.path.join(target, os.path.basename(path)): info
+            for path, info in self.transcript.items()}
+        self.aliases = {
+            os.path.join(target, os.path.basename(path)): os.path.join(target, os.path.basename(blob))
+            for path, blob in self.aliases.items()}
+        return True
+
+    def fingerprint(self) -> str:
+        """Fingerprint of the source dump.
+        Returns:
+            hash of the metadata.
+        """
+        with open(os.path.join(self.data_dir, 'meta.json'), 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+
+    @staticmethod
+    def completed(target: str, fingerprint: str) -> bool:
+        """Check the resampled copy is complete and up to date.
+        Args:
+            target: path to the resampled copy.
+            fingerprint: fingerprint of the source dump.
+        Returns:
+            whether the copy is available or not.
+        """
+        marker = os.path.join(target, DumpReader.COMPLETE)
+        if not os.path.exists(marker):
+            return False
+        with open(marker) as f:
+            return f.read().strip() == fingerprint
+
+    def build(self, target: str, fingerprint: str, num_proc: Optional[int] = None):
+        """Write the resampled copy of the dump.
+        Args:
+            target: path to the output directory.
+            fingerprint: fingerprint of the source dump, written on the completion marker.
+            num_proc: the number of the processes, the number of the cpus default.
+        """
+        num_proc = num_proc or os.cpu_count() or 1
+        # write on the temporal directory, concurrent builders may exist
+        tmp = f'{target}.tmp-{os.getpid()}'
+        os.makedirs(tmp, exist_ok=True)
+        try:
+            # resample the deduplicated blobs only
+            blobs = sorted(set(self.aliases.get(path, path) for path in self.transcript))
+            args = [
+                (path, os.path.join(tmp, os.path.basename(path)), self.prev_sr, self.sr)
+                for path in blobs]
+            if num_proc == 1:
+                for _ in tqdm(map(DumpReader.resample_worker, args), total=len(args)):
+                    pass
+            else:
+                with mp.Pool(num_proc) as pool:
+                    worker = pool.imap_unordered(DumpReader.resample_worker, args, chunksize=16)
+                    for _ in tqdm(worker, total=len(args)):
+                        pass
+            with open(os.path.join(tmp, DumpReader.COMPLETE), 'w') as f:
+                f.write(fingerprint)
+            os.rename(tmp, target)
+        except OSError:
+            if not DumpReader.completed(target, fingerprint):
+                raise
+            # completed by the other builder
+        finally:
+            # partial outputs of the failed or redundant build
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    @staticmethod
+    def resample_worker(args):
+        """Resample the dumped datum, multiprocessing purpose.
+        Args:
+            src: str, path to the dumped datum.
+            dst: str, path to the output.
+            prev_sr: int, sampling rate of the dump.
+            sr: int, target sampling rate.
+        """
+        src, dst, prev_sr, sr = args
+        sid, text, audio = tuple(np.load(src, allow_pickle=True))
+        audio = PolyphaseResampler()(audio, prev_sr, sr)
+        np.save(dst, (sid, text, audio))
+
+    def stats(self) -> Optional[Dict]:
+        """Precomputed dataset statistics stored next to the dump.
+        Returns:
+            statistics if computed, see `utils.stats.DatasetStats`.
+        """
+        from .stats import DatasetStats
+        return DatasetStats.load(self.data_dir)
+
     def preproc(self) -> Callable:
         """Return data preprocessor.
         Returns:
@@ -57,27 +193,37 @@ class DumpReader(datasets.DataReader):
         """
         return self.preprocessor
 
-    def load_data(self, data_dir: str) -> Tuple[int, List[str], Dict[str, Tuple[int, str]]]:
+    def load_data(self, data_dir: str) \
+            -> Tuple[int, List[str], Dict[str, Tuple[int, str]], Dict[str, str]]:
         """Load the file lists.
         Args:
             data_dir: path to the mother directory.
         Returns:
-            sampling rate, list of speakers and transcripts.
+            sampling rate, list of speakers, transcripts
+                and paths of the shared blobs for the deduplicated entries.
         """
         INTER = 'dumped'
         with open(os.path.join(data_dir, 'meta.json')) as f:
             meta = json.load(f)
 
-        speakers = [info['name'] for info in meta.values()]
-        # transpose
-        transcripts = {}
-        for sid, info in meta.items():
-            sid = int(sid)
-            for (i, text, _) in info['lists']:
-                path = os.path.join(data_dir, INTER, f'{i}.npy')
-                transcripts[path] = (sid, text)
+        # filter speaker entries
+        speakers = {int(sid): info for sid, info in meta.items() if sid.isdigit()}
+        speakers = [speakers[sid] for sid in sorted(speakers)]
+        # transpose, in order of the dumped index for sequential reads
+        entries = sorted(
+            (i, sid, text, rest[2] if len(rest) > 2 else None)
+            for sid, info in enumerate(speakers)
+            for i, text, *rest in info['lists'])
+        transcripts = {
+            os.path.join(data_dir, INTER, f'{i}.npy'): (sid, text)
+            for i, sid, text, _ in entries}
+        # deduplicated entries, index of the stored blob
+        aliases = {
+            os.path.join(data_dir, INTER, f'{i}.npy'): os.path.join(data_dir, INTER, f'{blob}.npy')
+            for i, _, _, blob in entries if blob is not None}
 
-        return meta.get('sr', None), speakers, transcripts
+        speakers = [info['name'] for info in speakers]
+        return meta.get('sr', None), speakers, transcripts, aliases
 
     def preprocessor(self, path: str) -> Tuple[int, str, np.ndarray]:
         """Load dumped.
@@ -89,32 +235,74 @@ class DumpReader(datasets.DataReader):
                 text: str, text.
                 audio: [np.float32; [T]], raw speech signal in range(-1, 1).
         """
-        sid, text, audio = tuple(np.load(path, allow_pickle=True))
-        if self.prev_sr != self.sr:
-            # resampling
-            audio = librosa.resample(audio, self.prev_sr, self.sr)
+        # blob could be shared with the other entries, use the own transcript
+        _, _, audio = tuple(np.load(self.aliases.get(path, path), allow_pickle=True))
+        sid, text = self.transcript[path]
+        if self.resampler is not None:
+            # resampling with the cached polyphase filter
+            audio = self.resampler(audio, self.prev_sr, self.sr)
         return sid, text, audio
 
     @staticmethod
-    def dumper(args) -> Tuple[int, int, str, str]:
+    def dumper(args) -> Tuple[int, int, str, str, Tuple[int, int], int, str]:
         """Dumper, multiprocessing purpose.
         Args:
             i: int, index of the datasets.
             path: str, path to the original datum.
             preproc: Callable, preprocessor.
             out_dir: path to the output directory.
+            trimmer: Optional[SilenceTrimmer], silence trimmer.
         Returns:
             i: index of the datasets.
             sid: speaker id.
             text: transcript.
             path: path to the original datum.
+            offsets: start and end offsets of the dumped region.
+            length: length of the original audio.
+            digest: content hash of the dumped audio.
         """
-        i, path, preproc, out_dir = args
-        outputs = preproc(path)
-        np.save(os.path.join(out_dir, f'{i}.npy'), outputs)
+        i, path, preproc, out_dir, trimmer = args
+        sid, text, audio = preproc(path)
+        length = len(audio)
+        offsets = (0, length)
+        if trimmer is not None:
+            audio, offsets = trimmer(audio)
+        np.save(os.path.join(out_dir, f'{i}.npy'), (sid, text, audio))
+        digest = hashlib.blake2b(
+            np.ascontiguousarray(audio).tobytes(), digest_size=16).hexdigest()
+        return i, sid, text, path, offsets, length, digest
 
-        sid, text, _ = outputs
-        return i, sid, text, path
+    @staticmethod
+    def collect(meta: Dict, worker: Iterable, out_dir: Optional[str] = None) \
+            -> Tuple[int, int, int, int]:
+        """Collect the dumper outputs into metadata.
+        Args:
+            meta: metadata.
+            worker: iterator of the dumper outputs.
+            out_dir: path to the dumped files, deduplicate the identical audios if provided.
+        Returns:
+            total length of the original audio, the number of the trimmed samples,
+            the number of the duplicates and the bytes saved by deduplication.
+        """
+        total, removed, duplicates, saved = 0, 0, 0, 0
+        # content hash to the index of the stored blob
+        blobs = {}
+        for i, sid, text, path, (start, end), length, digest in worker:
+            entry = (i, text, path, (start, end))
+            if out_dir is not None:
+                if digest in blobs:
+                    # alias the stored blob, remove the duplicate
+                    dup = os.path.join(out_dir, f'{i}.npy')
+                    saved += os.path.getsize(dup)
+                    os.remove(dup)
+                    duplicates += 1
+                    entry = (*entry, blobs[digest])
+                else:
+                    blobs[digest] = i
+            meta[sid]['lists'].append(entry)
+            total += length
+            removed += length - (end - start)
+        return total, removed, duplicates, saved
 
     @classmethod
     def dump(cls,
@@ -122,7 +310,9 @@ class DumpReader(datasets.DataReader):
              out_dir: str,
              sr: Optional[int] = None,
              num_proc: Optional[int] = None,
-             chunksize: int = 1):
+             chunksize: int = 1,
+             trimmer: Optional[SilenceTrimmer] = None,
+             dedup: bool = True):
         """Dump the reader.
         Args:
             reader: dataset reader.
@@ -130,9 +320,15 @@ class DumpReader(datasets.DataReader):
             sr: sampling rate of input dataset reader.
             num_proc: the number of the process for multiprocessing.
             chunksize: size of the imap_unordered chunk.
+            trimmer: silence trimmer, no trimming if None is provided.
+            dedup: whether store the identical audios only once or not.
         """
         INTER = 'dumped'
         os.makedirs(os.path.join(out_dir, INTER), exist_ok=True)
+        # resampled copies of the previous dump
+        for name in os.listdir(out_dir):
+            if name.startswith(f'{INTER}-'):
+                shutil.rmtree(os.path.join(out_dir, name), ignore_errors=True)
 
         speakers = reader.speakers()
         dataset, preproc = reader.dataset(), reader.preproc()
@@ -142,23 +338,33 @@ class DumpReader(datasets.DataReader):
             for sid, speaker in enumerate(speakers)}
         meta['sr'] = sr
 
+        args = [
+            (i, path, preproc, os.path.join(out_dir, INTER), trimmer)
+            for i, path in enumerate(dataset)]
+        blob_dir = os.path.join(out_dir, INTER) if dedup else None
         if num_proc is None:
-            for i, path in enumerate(tqdm(dataset)):
-                outputs = preproc(path)
-                np.save(os.path.join(out_dir, INTER, f'{i}.npy'), outputs)
-
-                sid, text, _ = outputs
-                meta[sid]['lists'].append((i, text, path))
+            worker = map(DumpReader.dumper, args)
+            total, removed, duplicates, saved = cls.collect(
+                meta, tqdm(worker, total=len(dataset)), blob_dir)
         else:
             with mp.Pool(num_proc) as pool:
                 worker = pool.imap_unordered(
-                    DumpReader.dumper,
-                    [
-                        (i, path, preproc, os.path.join(out_dir, INTER))
-                        for i, path in enumerate(dataset)],
-                    chunksize=chunksize)
-                for i, sid, text, path in tqdm(worker, total=len(dataset)):
-                    meta[sid]['lists'].append((i, text, path))
+                    DumpReader.dumper, args, chunksize=chunksize)
+                total, removed, duplicates, saved = cls.collect(
+                    meta, tqdm(worker, total=len(dataset)), blob_dir)
+
+        if dedup:
+            meta['dedup'] = {'duplicates': duplicates, 'bytes': saved}
+            print(f'[*] speechset.utils.dump.DumpReader: '
+                  f'{duplicates} duplicates aliased, {saved / 1024 / 1024:.2f}MB saved')
+
+        if trimmer is not None:
+            # report in seconds if sampling rate is given
+            unit = 'samples' if sr is None else 'seconds'
+            total, removed = (total, removed) if sr is None else (total / sr, removed / sr)
+            meta['trim'] = {'unit': unit, 'total': total, 'removed': removed}
+            print(f'[*] speechset.utils.dump.DumpReader: '
+                  f'{removed:.2f} {unit} trimmed out of {total:.2f} {unit}')
 
         with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
             json.dump(meta, f)
@@ -171,22 +377,39 @@ if __name__ == '__main__':
         parser.add_argument('--out-dir', required=True)
         parser.add_argument('--num-proc', default=None, type=int)
         parser.add_argument('--chunksize', default=1, type=int)
+        parser.add_argument('--autotune', default=False, action='store_true',
+                            help='use the calibrated --num-proc and --chunksize of the host')
         parser.add_argument('--default-sid', default=-1, type=int)
         parser.add_argument('--sr', default=22050, type=int)
+        parser.add_argument('--trim-db', default=None, type=float)
+        parser.add_argument('--peak', default=None, type=float)
+        parser.add_argument('--loudness', default=None, type=float,
+                            help='target rms level in dBFS, exclusive with --peak')
+        parser.add_argument('--no-dedup', default=False, action='store_true')
         args = parser.parse_args()
 
-        # hard code the reader
+        # hard code the reader, constructed concurrently
+        from functools import partial
         reader = datasets.ConcatReader([
-            datasets.LibriTTS('./datasets/LibriTTS/train-clean-100', args.sr),
-            datasets.LibriTTS('./datasets/LibriTTS/train-clean-360', args.sr),
-            datasets.LibriSpeech('./datasets/LibriSpeech/train-other-500', args.sr),
-            datasets.VCTK('./datasets/VCTK-Corpus', args.sr)])
+            partial(datasets.LibriTTS, './datasets/LibriTTS/train-clean-100', args.sr),
+            partial(datasets.LibriTTS, './datasets/LibriTTS/train-clean-360', args.sr),
+            partial(datasets.LibriSpeech, './datasets/LibriSpeech/train-other-500', args.sr),
+            partial(datasets.VCTK, './datasets/VCTK-Corpus', args.sr)])
+
+        num_proc, chunksize = args.num_proc, args.chunksize
+        if args.autotune:
+            from .autotune import Autotune
+            settings = Autotune().dump(reader)
+            num_proc, chunksize = settings['num_proc'], settings['chunksize']
 
         DumpReader.dump(
             reader,
             args.out_dir,
             args.sr,
-            args.num_proc,
-            args.chunksize)
+            num_proc,
+            chunksize,
+            None if args.trim_db is None and args.peak is None and args.loudness is None
+            else SilenceTrimmer(args.trim_db, peak=args.peak, loudness=args.loudness),
+            not args.no_dedup)
         
     main()
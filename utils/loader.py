@@ -0,0 +1,313 @@
+import multiprocessing as mp
+import queue
+import traceback
+from multiprocessing import shared_memory
+from typing import Any, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from ..speeches.sampler import Sampler
+from ..speeches.speechset import SpeechSet
+
+
+class SharedArena:
+    """Bump allocator over the single shared memory slot.
+    """
+    ALIGN = 64
+    # whether the overflow is reported on the process or not
+    WARNED = False
+
+    def __init__(self, buffer: memoryview):
+        """Initializer.
+        Args:
+            buffer: shared memory buffer of the slot.
+        """
+        self.buffer = buffer
+        self.offset = 0
+
+    def reset(self):
+        """Release all allocations.
+        """
+        self.offset = 0
+
+    def allocate(self, shape: Tuple[int, ...], dtype: np.dtype) -> np.ndarray:
+        """Allocate the zero-initialized buffer on the slot.
+        If the slot is exhausted, fallback to the heap allocation.
+        Args:
+            shape: shape of the buffer.
+            dtype: data type of the buffer.
+        Returns:
+            zero-filled buffer.
+        """
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape)) * dtype.itemsize
+        if self.offset + size > len(self.buffer):
+            if not SharedArena.WARNED:
+                import warnings
+                warnings.warn(
+                    f'shared memory slot of {len(self.buffer)} bytes is exhausted'
+                    ', fallback to the heap allocation and pickling, increase `slot_size`')
+                SharedArena.WARNED = True
+            return np.zeros(shape, dtype=dtype)
+        # [...]
+        array = np.ndarray(shape, dtype=dtype, buffer=self.buffer, offset=self.offset)
+        array.fill(0)
+        # align the next allocation
+        self.offset += -(-size // SharedArena.ALIGN) * SharedArena.ALIGN
+        return array
+
+    def spec(self, array: Any) -> Tuple:
+        """Describe the collated output for the transport.
+        Args:
+            array: collated output.
+        Returns:
+            ('shm', dtype, shape, offset) if the output is placed on the slot,
+            ('tuple', specs) or ('list', specs) for the nested outputs, eg. multi-task batches,
+            ('raw', output) otherwise, pickled through the pipe.
+        """
+        if isinstance(array, (tuple, list)):
+            return type(array).__name__, [self.spec(item) for item in array]
+        if isinstance(array, np.ndarray) and array.flags.c_contiguous:
+            base = np.frombuffer(self.buffer, dtype=np.uint8).ctypes.data
+            offset = array.ctypes.data - base
+            if 0 <= offset and offset + array.nbytes <= len(self.buffer):
+                return 'shm', array.dtype.str, array.shape, offset
+        return 'raw', array
+
+
+class SharedBatch(tuple):
+    """Collated batch of zero-copy views on the shared memory slot.
+    WARNING: views are invalidated after `release`, copy them for longer use.
+    """
+    def __new__(cls, outputs: List[Any], loader, slot: int):
+        batch = super().__new__(cls, outputs)
+        batch.loader, batch.slot = loader, slot
+        return batch
+
+    def release(self):
+        """Return the slot to the loader.
+        """
+        if self.slot is not None:
+            self.loader.release(self.slot)
+            self.slot = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.release()
+
+
+class SharedMemoryLoader:
+    """Process-based batch loader with shared memory transport.
+    Workers collate directly into the ring of preallocated shared memory slots,
+    and the consumer receives zero-copy numpy views.
+    Each batch holds its slot until `SharedBatch.release` is called,
+    and workers stall if all slots are in use.
+    """
+    def __init__(self,
+                 speechset: SpeechSet,
+                 batch: int,
+                 num_workers: int = 2,
+                 slots: Optional[int] = None,
+                 slot_size: int = 64 * 1024 * 1024,
+                 drop_last: bool = False,
+                 sampler: Optional[Sampler] = None):
+        """Initializer.
+        Args:
+            speechset: dataset.
+            batch: size of the batch.
+            num_workers: the number of the worker processes.
+            slots: the number of the shared memory slots, twice of workers default.
+            slot_size: size of the single slot in bytes.
+            drop_last: whether drop the last incomplete batch or not.
+            sampler: batch sampler, overrides `batch` and `drop_last` if provided.
+        """
+        self.speechset = speechset
+        self.batch = batch
+        self.num_workers = num_workers
+        self.slots = slots or 2 * num_workers
+        self.slot_size = slot_size
+        self.drop_last = drop_last
+        self.sampler = sampler
+        # epoch of the sampler, update before each iteration
+        self.epoch = 0
+
+    def batches(self) -> List[List[int]]:
+        """Generate indices of the batches.
+        Returns:
+            list of the batch indices.
+        """
+        if self.sampler is not None:
+            return [
+                self.sampler.indices(self.epoch, i)
+                for i in range(len(self.sampler))]
+        size = len(self.speechset)
+        if self.drop_last:
+            size -= size % self.batch
+        return [
+            list(range(i, min(i + self.batch, size)))
+            for i in range(0, size, self.batch)]
+
+    def __len__(self) -> int:
+        """Return the number of the batches.
+        Returns:
+            the number of the batches.
+        """
+        return len(self.batches())
+
+    def __iter__(self) -> Iterator[SharedBatch]:
+        """Start the workers and iterate the batches.
+        Returns:
+            iterator of shared batches.
+        """
+        ctx = mp.get_context()
+        self.shms = [
+            shared_memory.SharedMemory(create=True, size=self.slot_size)
+            for _ in range(self.slots)]
+        self.tasks, self.results = ctx.Queue(), ctx.Queue()
+        self.workers = [
+            ctx.Process(
+                target=SharedMemoryLoader.worker,
+                args=(self.speechset, [shm.name for shm in self.shms],
+                      self.tasks, self.results),
+                daemon=True)
+            for _ in range(self.num_workers)]
+        for worker in self.workers:
+            worker.start()
+
+        self.pending = iter(enumerate(self.batches()))
+        # slots held by the consumer
+        self.held = set()
+        # dispatch tasks as much as slots, in order
+        for slot in range(self.slots):
+            self.dispatch(slot)
+        try:
+            yield from self.collect(len(self))
+        finally:
+            for _ in self.workers:
+                self.tasks.put(None)
+            for worker in self.workers:
+                worker.join(timeout=1)
+                if worker.is_alive():
+                    worker.terminate()
+            for shm in self.shms:
+                try:
+                    shm.close()
+                except BufferError:
+                    # views are still alive on the consumer side
+                    pass
+                shm.unlink()
+
+    def dispatch(self, slot: int):
+        """Dispatch the next batch to the free slot.
+        Args:
+            slot: index of the free slot.
+        """
+        task = next(self.pending, None)
+        if task is not None:
+            i, indices = task
+            self.tasks.put((i, slot, indices, self.epoch))
+
+    def release(self, slot: int):
+        """Release the slot and dispatch the next batch on it.
+        Args:
+            slot: index of the slot.
+        """
+        self.held.discard(slot)
+        self.dispatch(slot)
+
+    def collect(self, total: int) -> Iterator[SharedBatch]:
+        """Reorder the worker outputs.
+        Args:
+            total: the number of the batches.
+        Returns:
+            shared batches in dispatched order.
+        """
+        buffer = {}
+        for i in range(total):
+            if len(self.held) >= self.slots:
+                raise RuntimeError(
+                    'speechset.utils.loader.SharedMemoryLoader: all slots are held, '
+                    'call `SharedBatch.release` after using the batch')
+            while i not in buffer:
+                try:
+                    j, slot, specs = self.results.get(timeout=1)
+                except queue.Empty:
+                    if not all(worker.is_alive() for worker in self.workers):
+                        raise RuntimeError(
+                            'speechset.utils.loader.SharedMemoryLoader: worker exited unexpectedly')
+                    continue
+                if slot is None:
+                    raise RuntimeError(
+                        f'speechset.utils.loader.SharedMemoryLoader: worker failed\n{specs}')
+                buffer[j] = (slot, specs)
+            slot, specs = buffer.pop(i)
+            self.held.add(slot)
+            yield SharedBatch(
+                [self.view(slot, spec) for spec in specs], self, slot)
+
+    def view(self, slot: int, spec: Tuple) -> Any:
+        """Construct the zero-copy view.
+        Args:
+            slot: index of the slot.
+            spec: transport specification, reference `SharedArena.spec`.
+        Returns:
+            collated output.
+        """
+        if spec[0] == 'raw':
+            return spec[1]
+        if spec[0] in ('tuple', 'list'):
+            nested = [self.view(slot, item) for item in spec[1]]
+            return tuple(nested) if spec[0] == 'tuple' else nested
+        _, dtype, shape, offset = spec
+        return np.ndarray(shape, dtype=dtype, buffer=self.shms[slot].buf, offset=offset)
+
+    @staticmethod
+    def worker(speechset: SpeechSet,
+               names: List[str],
+               tasks: mp.Queue,
+               results: mp.Queue):
+        """Collate batches into shared memory slots, multiprocessing purpose.
+        Args:
+            speechset: dataset.
+            names: names of the shared memory slots.
+            tasks: queue of the (batch index, slot index, indices, epoch).
+            results: queue of the (batch index, slot index, specifications).
+        """
+        # attach to the slots
+        shms = [shared_memory.SharedMemory(name=name) for name in names]
+        arenas = [SharedArena(shm.buf) for shm in shms]
+        try:
+            while True:
+                task = tasks.get()
+                if task is None:
+                    break
+                i, slot, indices, epoch = task
+                arena = arenas[slot]
+                arena.reset()
+                # route collation buffers, including wrapped datasets
+                target = speechset
+                while isinstance(target, SpeechSet):
+                    target.allocate = arena.allocate
+                    target = getattr(target, 'speechset', None)
+                if speechset.augment is not None:
+                    # epoch-dependent augmentation
+                    speechset.augment.epoch = epoch
+                try:
+                    outputs = speechset[indices]
+                    if not isinstance(outputs, (tuple, list)):
+                        outputs = [outputs]
+                    results.put((i, slot, [arena.spec(out) for out in outputs]))
+                    outputs = None
+                except Exception:
+                    results.put((i, None, traceback.format_exc()))
+                    break
+        finally:
+            # drop all views before closing the slots
+            arenas = target = speechset = outputs = None
+            for shm in shms:
+                try:
+                    shm.close()
+                except BufferError:
+                    pass
@@ -1,6 +1,8 @@
-import librosa
+from typing import List, Tuple, Union
+
 import numpy as np
 
+from .precision import Precision
 from ..config import Config
 
 
@@ -13,17 +15,33 @@ class MelSTFT:
             config: STFT parameters.
         """
         self.config = config
-        # [mel, fft // 2 + 1], generate mel-filters
-        self.melfilter = librosa.filters.mel(
-            config.sr, config.fft, config.mel, config.fmin, config.fmax)
+        self.precision = Precision(config)
+        # lazy generation of the mel-filters
+        self.melfilter_ = None
+
+    @property
+    def melfilter(self) -> np.ndarray:
+        """Mel-filters, generated on the first access.
+        Returns:
+            [np.float32; [mel, fft // 2 + 1]], mel-filters.
+        """
+        if self.melfilter_ is None:
+            self.melfilter_ = MultiMelSTFT.melfilter(self.config)
+        return self.melfilter_
 
-    def __call__(self, signal: np.ndarray) -> np.ndarray:
+    def __call__(self, signal: np.ndarray, aux: bool = False) \
+            -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray, np.ndarray]]:
         """Generate log-mel scale power spectrogram from inputs.
         Args:
             signal: [np.float32; [T]], speech signal.
+            aux: whether return the linear magnitude and frame energy or not.
         Returns:
-            [np.float32; [T / hop, mel]], log-mel scale power spectrogram.
+            [config.dtype; [T / hop, mel]], log-mel scale power spectrogram.
+            if `aux` is True, additionally,
+                [config.dtype; [T / hop, fft // 2 + 1]], linear magnitude.
+                [config.dtype; [T / hop]], frame energy, l2-norm of the magnitude.
         """
+        import librosa
         # [fft // 2 + 1, T // hop + 1]
         stft = librosa.stft(
             signal,
@@ -32,7 +50,102 @@ class MelSTFT:
             self.config.win,
             self.config.win_fn,
             center=True, pad_mode='reflect')
+        # [fft // 2 + 1, T // hop + 1]
+        mag = np.abs(stft)
         # [mel, T // hop + 1]
-        mel = self.melfilter @ np.abs(stft)
+        mel = self.melfilter @ mag
         # [T // hop + 1, mel]
-        return np.log(np.maximum(mel, self.config.eps)).T
+        logmel = np.log(np.maximum(mel, self.config.eps)).T
+        if not aux:
+            return self.precision.cast(logmel)
+        # [T // hop + 1]
+        energy = np.linalg.norm(mag, axis=0)
+        return tuple(map(self.precision.cast, (logmel, mag.T, energy)))
+
+
+class MultiMelSTFT:
+    """Generate log-mel scale power spectrograms of multiple STFT resolutions
+    from the single signal, sharing the padded signal, windows and mel-filters.
+    """
+    # shared caches of the windows and mel-filters
+    WINDOWS = {}
+    FILTERS = {}
+
+    def __init__(self, configs: List[Config]):
+        """Initializer.
+        Args:
+            configs: list of the STFT parameters, sampling rates should be the same.
+        """
+        assert len(set(config.sr for config in configs)) == 1, \
+            'sampling rates of the configurations should be the same'
+        self.configs = configs
+        self.precisions = [Precision(config) for config in configs]
+        # lazy generation of the windows and mel-filters
+        self.windows, self.melfilters = None, None
+        self.maxpad = max(config.fft // 2 for config in configs)
+
+    @staticmethod
+    def window(config: Config) -> np.ndarray:
+        """Generate the window padded to the fft size.
+        Args:
+            config: STFT parameters.
+        Returns:
+            [np.float32; [fft]], window.
+        """
+        key = (config.win_fn, config.win, config.fft)
+        if key not in MultiMelSTFT.WINDOWS:
+            import librosa
+            window = librosa.filters.get_window(config.win_fn, config.win, fftbins=True)
+            MultiMelSTFT.WINDOWS[key] = librosa.util.pad_center(
+                window, config.fft).astype(np.float32)
+        return MultiMelSTFT.WINDOWS[key]
+
+    @staticmethod
+    def melfilter(config: Config) -> np.ndarray:
+        """Generate mel-filters.
+        Args:
+            config: STFT parameters.
+        Returns:
+            [np.float32; [mel, fft // 2 + 1]], mel-filters.
+        """
+        key = (config.sr, config.fft, config.mel, config.fmin, config.fmax)
+        if key not in MultiMelSTFT.FILTERS:
+            import librosa
+            MultiMelSTFT.FILTERS[key] = librosa.filters.mel(
+                config.sr, config.fft, config.mel, config.fmin, config.fmax)
+        return MultiMelSTFT.FILTERS[key]
+
+    def __call__(self, signal: np.ndarray) -> List[np.ndarray]:
+        """Generate log-mel scale power spectrograms from inputs.
+        Args:
+            signal: [np.float32; [T]], speech signal.
+        Returns:
+            list of [config.dtype; [T / hop, mel]], log-mel scale power spectrograms,
+                in order of the configurations.
+        """
+        if self.windows is None:
+            # [fft], windows padded to the fft size
+            self.windows = [MultiMelSTFT.window(config) for config in self.configs]
+            # [mel, fft // 2 + 1]
+            self.melfilters = [MultiMelSTFT.melfilter(config) for config in self.configs]
+        # [T + 2 x maxpad], reflect-padded once for all resolutions
+        padded = np.pad(signal, self.maxpad, mode='reflect')
+        mels = []
+        for config, precision, window, melfilter in zip(
+                self.configs, self.precisions, self.windows, self.melfilters):
+            offset = self.maxpad - config.fft // 2
+            # [T + 2 x (fft // 2)]
+            centered = padded[offset:len(padded) - offset]
+            # [T // hop + 1, fft], zero-copy framing
+            stride, = centered.strides
+            frames = np.lib.stride_tricks.as_strided(
+                centered,
+                shape=(1 + (len(centered) - config.fft) // config.hop, config.fft),
+                strides=(stride * config.hop, stride),
+                writeable=False)
+            # [T // hop + 1, fft // 2 + 1]
+            mag = np.abs(np.fft.rfft(frames * window, axis=-1)).astype(np.float32)
+            # [T // hop + 1, mel]
+            mel = mag @ melfilter.T
+            mels.append(precision.cast(np.log(np.maximum(mel, config.eps))))
+        return mels
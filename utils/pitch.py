@@ -0,0 +1,88 @@
+import numpy as np
+
+from ..config import Config
+
+
+class PitchEstimator:
+    """Frame-level fundamental frequency estimator, vectorized YIN.
+    Frames are aligned with the centered STFT of `MelSTFT`.
+    """
+    def __init__(self, config: Config, threshold: float = 0.1):
+        """Initializer.
+        Args:
+            config: STFT parameters and pitch range.
+            threshold: threshold of the cumulative mean normalized difference.
+        """
+        self.config = config
+        self.threshold = threshold
+        # lags of the candidate periods
+        self.taumin = max(int(config.sr // config.f0max), 1)
+        self.taumax = min(int(config.sr // config.f0min), config.fft // 2)
+        # integration window
+        self.width = config.fft - self.taumax
+        # fft size for the correlation
+        self.nfft = 1 << int(np.ceil(np.log2(config.fft + self.width)))
+
+    def frames(self, signal: np.ndarray) -> np.ndarray:
+        """Frame the signal as centered STFT.
+        Args:
+            signal: [np.float32; [T]], speech signal.
+        Returns:
+            [np.float32; [T // hop + 1, fft]], frames.
+        """
+        fft, hop = self.config.fft, self.config.hop
+        # [T + fft]
+        padded = np.pad(signal, fft // 2, mode='reflect')
+        stride, = padded.strides
+        return np.lib.stride_tricks.as_strided(
+            padded,
+            shape=(1 + (len(padded) - fft) // hop, fft),
+            strides=(stride * hop, stride),
+            writeable=False)
+
+    def __call__(self, signal: np.ndarray) -> np.ndarray:
+        """Estimate the fundamental frequencies.
+        Args:
+            signal: [np.float32; [T]], speech signal.
+        Returns:
+            [np.float32; [T // hop + 1]], fundamental frequencies, 0 for unvoiced frames.
+        """
+        # [F, fft]
+        frames = self.frames(signal).astype(np.float64)
+        # [F, taumax + 1], cross-correlation of the integration window and the frame
+        acf = np.fft.irfft(
+            np.fft.rfft(frames, self.nfft)
+            * np.conj(np.fft.rfft(frames[:, :self.width], self.nfft)),
+            self.nfft)[:, :self.taumax + 1]
+        # [F, fft + 1]
+        cumsum = np.concatenate(
+            [np.zeros([len(frames), 1]), np.cumsum(frames ** 2, axis=-1)], axis=-1)
+        # [F, taumax + 1], energy of the shifted window
+        energy = cumsum[:, self.width:self.width + self.taumax + 1] \
+            - cumsum[:, :self.taumax + 1]
+        # [F, taumax + 1], difference function
+        diff = np.maximum(energy[:, :1] + energy - 2 * acf, 0.)
+        # [F, taumax + 1], cumulative mean normalized difference
+        cmnd = np.ones_like(diff)
+        cumdiff = np.cumsum(diff[:, 1:], axis=-1)
+        # silent frames are left as unvoiced
+        cmnd[:, 1:] = np.where(
+            cumdiff > 1e-10,
+            diff[:, 1:] * np.arange(1, self.taumax + 1) / np.maximum(cumdiff, 1e-10),
+            1.)
+        # [F, taumax - taumin - 1], local minima under the threshold
+        cand = cmnd[:, self.taumin:self.taumax]
+        local = (cand[:, 1:-1] < self.threshold) \
+            & (cand[:, 1:-1] <= cand[:, :-2]) & (cand[:, 1:-1] <= cand[:, 2:])
+        # [F]
+        voiced = local.any(axis=-1)
+        tau = np.argmax(local, axis=-1) + self.taumin + 1
+        # [F], parabolic interpolation
+        rows = np.arange(len(frames))
+        prev, curr, succ = cmnd[rows, tau - 1], cmnd[rows, tau], cmnd[rows, tau + 1]
+        denom = prev - 2 * curr + succ
+        shift = np.where(
+            np.abs(denom) > 1e-10, 0.5 * (prev - succ) / np.where(denom == 0, 1, denom), 0.)
+        # [F]
+        f0 = self.config.sr / (tau + np.clip(shift, -1, 1))
+        return np.where(voiced, f0, 0.).astype(np.float32)
@@ -0,0 +1,107 @@
+from typing import Optional
+
+import numpy as np
+
+from ..config import Config
+
+
+class Precision:
+    """Output data types of the features, labels and lengths.
+    bfloat16 features are stored as the upper half of the float32 bits, in np.uint16.
+    """
+    FEATURES = {'float32': np.float32, 'float16': np.float16, 'bfloat16': np.uint16}
+    LABELS = {'int64': np.int64, 'int32': np.int32, 'int16': np.int16}
+
+    def __init__(self, config: Config):
+        """Initializer.
+        Args:
+            config: configuration, `dtype` and `label_dtype`.
+        """
+        assert config.dtype in Precision.FEATURES, \
+            f'invalid feature dtype `{config.dtype}`, expected one of {list(Precision.FEATURES)}'
+        assert config.label_dtype in Precision.LABELS, \
+            f'invalid label dtype `{config.label_dtype}`, expected one of {list(Precision.LABELS)}'
+        self.bfloat16 = config.dtype == 'bfloat16'
+        self.feature = np.dtype(Precision.FEATURES[config.dtype])
+        self.label = np.dtype(Precision.LABELS[config.label_dtype])
+        # sample counts of the waveforms, at least int32
+        self.sample = np.promote_types(self.label, np.int32)
+
+    @staticmethod
+    def to_bfloat16(x: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Round float32 to the nearest-even bfloat16.
+        Args:
+            x: [np.float32; [...]], inputs.
+            out: [np.uint16; [...]], output buffer, allocated if not provided.
+        Returns:
+            [np.uint16; [...]], bfloat16 bits.
+        """
+        # [...]
+        bits = np.ascontiguousarray(x, dtype=np.float32).view(np.uint32)
+        # round to nearest, ties to even on the truncated lower half
+        rounded = bits + (np.uint32(0x7FFF) + ((bits >> 16) & np.uint32(1)))
+        if out is None:
+            return (rounded >> 16).astype(np.uint16)
+        np.right_shift(rounded, 16, out=out, casting='unsafe')
+        return out
+
+    @staticmethod
+    def from_bfloat16(x: np.ndarray) -> np.ndarray:
+        """Restore float32 from the bfloat16 bits.
+        Args:
+            x: [np.uint16; [...]], bfloat16 bits.
+        Returns:
+            [np.float32; [...]], restored.
+        """
+        return (x.astype(np.uint32) << 16).view(np.float32)
+
+    def cast(self, x: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Cast the features to the output dtype.
+        Args:
+            x: [np.float32; [...]], features.
+            out: [feature dtype; [...]], output buffer, eg. slice of the collation buffer,
+                converted in place if provided.
+        Returns:
+            [feature dtype; [...]], casted features.
+        """
+        if self.bfloat16 and x.dtype != np.uint16:
+            return Precision.to_bfloat16(x, out=out)
+        if out is None:
+            return x.astype(self.feature, copy=False)
+        out[...] = x
+        return out
+
+    def lengths(self, lengths: np.ndarray, dtype: Optional[np.dtype] = None) -> np.ndarray:
+        """Cast the labels or lengths to the label dtype.
+        Args:
+            lengths: [np.long; [...]], integer values.
+            dtype: output dtype, label dtype default.
+        Returns:
+            [label dtype; [...]], casted values.
+        """
+        dtype = dtype or self.label
+        lengths = np.asarray(lengths)
+        if lengths.size > 0 and lengths.max() > np.iinfo(dtype).max:
+            raise ValueError(
+                f'values exceed the range of the dtype `{dtype}`, max {lengths.max()}')
+        return lengths.astype(dtype, copy=False)
+
+    def samples(self, lengths: np.ndarray) -> np.ndarray:
+        """Cast the sample counts of the waveforms, at least int32.
+        Args:
+            lengths: [np.long; [...]], sample counts.
+        Returns:
+            [sample dtype; [...]], casted values.
+        """
+        return self.lengths(lengths, self.sample)
+
+    def restore(self, x: np.ndarray) -> np.ndarray:
+        """Restore float32 from the features of the output dtype.
+        Args:
+            x: [feature dtype; [...]], features.
+        Returns:
+            [np.float32; [...]], restored.
+        """
+        if self.bfloat16:
+            return Precision.from_bfloat16(x)
+        return x.astype(np.float32, copy=False)
@@ -0,0 +1,84 @@
+from fractions import Fraction
+from typing import Tuple
+
+import numpy as np
+
+
+class PolyphaseResampler:
+    """Polyphase resampler with the cached anti-aliasing filters per ratio.
+    """
+    # shared cache of the (up, down) filters
+    FILTERS = {}
+
+    def __init__(self, max_denominator: int = 1000):
+        """Initializer.
+        Args:
+            max_denominator: maximum denominator for rational approximation of the ratio.
+        """
+        self.max_denominator = max_denominator
+
+    @staticmethod
+    def filter(up: int, down: int) -> Tuple[np.ndarray, int]:
+        """Design the kaiser-windowed low-pass filter, cached.
+        Args:
+            up: upsampling factor.
+            down: downsampling factor.
+        Returns:
+            [np.float32; [K]], filter, zero-padded to center the outputs.
+            the number of the leading samples to remove.
+        """
+        key = (up, down)
+        if key not in PolyphaseResampler.FILTERS:
+            # lazy import, heavy dependencies
+            from scipy.signal import firwin
+            half = 10 * max(up, down)
+            # [2 x half + 1]
+            h = firwin(2 * half + 1, 1. / max(up, down), window=('kaiser', 5.0)) * up
+            prepad = down - half % down
+            PolyphaseResampler.FILTERS[key] = (
+                np.concatenate([np.zeros(prepad), h]).astype(np.float32),
+                (half + prepad) // down)
+        return PolyphaseResampler.FILTERS[key]
+
+    def ratio(self, sr: int, target: float) -> Tuple[int, int]:
+        """Rational approximation of the resampling ratio.
+        Args:
+            sr: source sampling rate.
+            target: target sampling rate.
+        Returns:
+            upsampling and downsampling factors.
+        """
+        frac = (Fraction(target) / sr).limit_denominator(self.max_denominator)
+        return frac.numerator, frac.denominator
+
+    def resample(self, audio: np.ndarray, up: int, down: int) -> np.ndarray:
+        """Resample the signal with rational factors.
+        Args:
+            audio: [np.float32; [T]], audio signal.
+            up: upsampling factor.
+            down: downsampling factor.
+        Returns:
+            [np.float32; [ceil(T x up / down)]], resampled.
+        """
+        if up == down:
+            return audio
+        from scipy.signal import upfirdn
+        h, remove = PolyphaseResampler.filter(up, down)
+        length = -(-len(audio) * up // down)
+        # [T']
+        out = upfirdn(h, audio.astype(np.float32), up, down)[remove:remove + length]
+        if len(out) < length:
+            # zero-padded tail of the filter
+            out = np.pad(out, [0, length - len(out)])
+        return out.astype(np.float32)
+
+    def __call__(self, audio: np.ndarray, sr: int, target: float) -> np.ndarray:
+        """Resample the signal.
+        Args:
+            audio: [np.float32; [T]], audio signal.
+            sr: source sampling rate.
+            target: target sampling rate.
+        Returns:
+            [np.float32; [T x target / sr]], resampled.
+        """
+        return self.resample(audio, *self.ratio(sr, target))
@@ -0,0 +1,166 @@
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import numpy as np
+
+from .melstft import MultiMelSTFT
+from .normalizer import TextNormalizer
+from .precision import Precision
+from ..config import Config
+
+
+class LabelTable(dict):
+    """Translation table of the graphemes to the label characters,
+    unknown characters are mapped to the out-of-vocabulary sentinel.
+    """
+    # sentinel, larger than any valid label
+    UNKNOWN = chr(len(TextNormalizer.GRAPHEMES) + 1)
+
+    def __missing__(self, key: int) -> str:
+        """Map the unknown character, including the control characters, to the sentinel.
+        """
+        return LabelTable.UNKNOWN
+
+
+class Workspace:
+    """Preallocated work buffers for the single extraction.
+    """
+    def __init__(self, config: Config, max_len: int):
+        """Initializer.
+        Args:
+            config: STFT parameters.
+            max_len: maximum length of the signal.
+        """
+        pad = config.fft // 2
+        frames = 1 + max_len // config.hop
+        # [max_len + fft]
+        self.padded = np.zeros(max_len + 2 * pad, dtype=np.float32)
+        # [F, fft]
+        self.frames = np.zeros([frames, config.fft], dtype=np.float32)
+        # [F, fft // 2 + 1]
+        self.mag = np.zeros([frames, config.fft // 2 + 1], dtype=np.float32)
+        # [F, mel]
+        self.mel = np.zeros([frames, config.mel], dtype=np.float32)
+
+
+class ServingFeaturizer:
+    """Low-latency single utterance featurizer for inference serving.
+    Work buffers are preallocated for the maximum utterance length
+    and pooled for the thread-safe concurrent use.
+    """
+    def __init__(self,
+                 config: Config,
+                 max_len: int,
+                 concurrency: int = 4,
+                 report_level: Optional[int] = None):
+        """Initializer.
+        Args:
+            config: STFT parameters.
+            max_len: maximum length of the signal, longer ones fallback to temporal buffers.
+            concurrency: the number of the pooled work buffers.
+            report_level: text normalizing error report level.
+        """
+        self.config = config
+        self.max_len = max_len
+        self.concurrency = concurrency
+        self.precision = Precision(config)
+        self.textnorm = TextNormalizer(report_level)
+        # translation table, grapheme to the label character
+        table = LabelTable({
+            ord(g): chr(i + 1) for i, g in enumerate(TextNormalizer.GRAPHEMES)})
+        for rep, out in self.textnorm.replacer.items():
+            table[ord(rep)] = ''.join(
+                chr(TextNormalizer.GRAPHEMES.index(o) + 1) for o in out)
+        self.table = table
+        self.window, self.melfilter_t, self.pool = None, None, None
+        self.lock = threading.Lock()
+
+    def warmup(self):
+        """Generate filters, preallocate work buffers and run the dummy extraction.
+        """
+        with self.lock:
+            if self.pool is not None:
+                return
+            # [fft]
+            self.window = MultiMelSTFT.window(self.config)
+            # [fft // 2 + 1, mel], contiguous for the matmul outputs
+            self.melfilter_t = np.ascontiguousarray(MultiMelSTFT.melfilter(self.config).T)
+            pool = queue.Queue()
+            for _ in range(self.concurrency):
+                pool.put(Workspace(self.config, self.max_len))
+            self.pool = pool
+        # dummy run
+        self.mel(np.zeros(self.config.fft, dtype=np.float32))
+        self.labeling(TextNormalizer.GRAPHEMES)
+
+    @contextmanager
+    def workspace(self, length: int) -> Iterator[Workspace]:
+        """Acquire the work buffers, block if all buffers are in use.
+        Args:
+            length: length of the signal.
+        Returns:
+            pooled workspace, or temporal one for the signal longer than `max_len`.
+        """
+        if length > self.max_len:
+            yield Workspace(self.config, length)
+            return
+        workspace = self.pool.get()
+        try:
+            yield workspace
+        finally:
+            self.pool.put(workspace)
+
+    def labeling(self, text: str) -> np.ndarray:
+        """Normalize text and make to integer label.
+        Args:
+            text: input text.
+        Returns:
+            [config.label_dtype; [S]], labeled text sequence.
+        """
+        # all characters are translated into the range of the label or the sentinel
+        labels = np.frombuffer(
+            text.lower().translate(self.table).encode('latin-1'), dtype=np.uint8)
+        if (labels > len(TextNormalizer.GRAPHEMES)).any():
+            # out-of-domain graphemes, report with the normalizer
+            return np.array(self.textnorm.labeling(text), dtype=self.precision.label)
+        return labels.astype(self.precision.label)
+
+    def mel(self, signal: np.ndarray) -> np.ndarray:
+        """Generate log-mel scale power spectrogram.
+        Args:
+            signal: [np.float32; [T]], speech signal.
+        Returns:
+            [config.dtype; [T // hop + 1, mel]], log-mel scale power spectrogram.
+        """
+        if self.pool is None:
+            self.warmup()
+        fft, hop = self.config.fft, self.config.hop
+        pad = fft // 2
+        if len(signal) <= pad:
+            # too short to reflect in place
+            return MultiMelSTFT([self.config])(signal)[0]
+        length = len(signal)
+        frames = 1 + length // hop
+        with self.workspace(length) as ws:
+            # [T + fft], reflect padding in place
+            padded = ws.padded[:length + 2 * pad]
+            padded[pad:pad + length] = signal
+            padded[:pad] = signal[pad:0:-1]
+            padded[pad + length:] = signal[-2:-pad - 2:-1]
+            # [F, fft], windowed frames
+            stride, = padded.strides
+            view = np.lib.stride_tricks.as_strided(
+                padded, shape=(frames, fft), strides=(stride * hop, stride), writeable=False)
+            np.multiply(view, self.window, out=ws.frames[:frames])
+            # [F, fft // 2 + 1]
+            mag = np.abs(np.fft.rfft(ws.frames[:frames], axis=-1), out=ws.mag[:frames])
+            # [F, mel]
+            mel = np.matmul(mag, self.melfilter_t, out=ws.mel[:frames])
+            np.maximum(mel, self.config.eps, out=mel)
+            np.log(mel, out=mel)
+            if self.precision.feature == np.float32:
+                return mel.copy()
+            # casting copies out of the workspace
+            return self.precision.cast(mel)
@@ -0,0 +1,280 @@
+import copy
+import json
+import multiprocessing as mp
+import os
+from typing import Any, Dict, Optional, Union
+
+import numpy as np
+from tqdm import tqdm
+
+from .melstft import MelSTFT
+from ..config import Config
+from ..datasets import DataReader
+
+
+class Welford:
+    """Mergeable streaming accumulator of the mean and variance, Welford/Chan.
+    """
+    def __init__(self, dim: int):
+        """Initializer.
+        Args:
+            dim: size of the feature dimension.
+        """
+        self.count = 0
+        self.mean = np.zeros(dim, dtype=np.float64)
+        self.m2 = np.zeros(dim, dtype=np.float64)
+
+    def merge_moments(self, count: int, mean: np.ndarray, m2: np.ndarray):
+        """Merge the moments with Chan's parallel algorithm.
+        Args:
+            count: the number of the samples.
+            mean: [np.float64; [D]], mean.
+            m2: [np.float64; [D]], sum of the squared deviations.
+        """
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean = self.mean + delta * (count / total)
+        self.m2 = self.m2 + m2 + delta ** 2 * (self.count * count / total)
+        self.count = total
+
+    def update(self, x: np.ndarray):
+        """Update with the batch of the samples.
+        Args:
+            x: [np.float32; [N, D]], samples.
+        """
+        if len(x) == 0:
+            return
+        x = x.astype(np.float64)
+        mean = x.mean(axis=0)
+        self.merge_moments(len(x), mean, ((x - mean) ** 2).sum(axis=0))
+
+    def merge(self, other):
+        """Merge the other accumulator.
+        Args:
+            other: Welford, accumulator.
+        """
+        self.merge_moments(other.count, other.mean, other.m2)
+
+    @property
+    def std(self) -> np.ndarray:
+        """Population standard deviation.
+        Returns:
+            [np.float64; [D]], standard deviation.
+        """
+        return np.sqrt(self.m2 / max(self.count, 1))
+
+    def state_dict(self) -> Dict[str, Any]:
+        """Serializable state.
+        Returns:
+            count, mean, m2 and std.
+        """
+        return {
+            'count': self.count,
+            'mean': self.mean.tolist(),
+            'm2': self.m2.tolist(),
+            'std': self.std.tolist()}
+
+
+class Histogram:
+    """Mergeable fixed-bin histogram, the last bin accumulates the overflows.
+    """
+    def __init__(self, bins: int, width: float):
+        """Initializer.
+        Args:
+            bins: the number of the bins.
+            width: width of the bin.
+        """
+        self.width = width
+        self.counts = np.zeros(bins, dtype=np.int64)
+
+    def update(self, values: Union[float, np.ndarray]):
+        """Update with the values.
+        Args:
+            values: values.
+        """
+        index = np.clip(
+            (np.atleast_1d(values) / self.width).astype(np.int64), 0, len(self.counts) - 1)
+        self.counts += np.bincount(index, minlength=len(self.counts))
+
+    def merge(self, other):
+        """Merge the other histogram.
+        Args:
+            other: Histogram, histogram with the same bins.
+        """
+        self.counts += other.counts
+
+    def state_dict(self) -> Dict[str, Any]:
+        """Serializable state.
+        Returns:
+            width and counts of the bins.
+        """
+        return {'width': self.width, 'counts': self.counts.tolist()}
+
+
+class DatasetStats:
+    """Streaming statistics of the dataset,
+    mel mean/std, duration, frame count, text length and per-speaker counts.
+    """
+    FILENAME = 'stats.json'
+
+    def __init__(self, config: Config, speakers: int, sr: int):
+        """Initializer.
+        Args:
+            config: STFT parameters.
+            speakers: the number of the speakers.
+            sr: sampling rate of the audio.
+        """
+        self.sr = sr
+        self.mel = Welford(config.mel)
+        # 0.5s bins up to 60s
+        self.duration = Histogram(120, 0.5)
+        # 16 frames bins
+        self.frames = Histogram(256, 16)
+        # 5 characters bins
+        self.textlen = Histogram(200, 5)
+        self.speakers = np.zeros(speakers, dtype=np.int64)
+
+    def update(self, sid: int, text: str, audio: np.ndarray, mel: np.ndarray):
+        """Update with the single datum.
+        Args:
+            sid: speaker id.
+            text: transcription.
+            audio: [np.float32; [T]], audio signal.
+            mel: [np.float32; [T // hop + 1, mel]], log-mel spectrogram.
+        """
+        self.mel.update(mel)
+        self.duration.update(len(audio) / self.sr)
+        self.frames.update(len(mel))
+        self.textlen.update(len(text))
+        if 0 <= sid < len(self.speakers):
+            self.speakers[sid] += 1
+
+    def merge(self, other):
+        """Merge the other statistics.
+        Args:
+            other: DatasetStats, statistics of the other shard.
+        """
+        self.mel.merge(other.mel)
+        self.duration.merge(other.duration)
+        self.frames.merge(other.frames)
+        self.textlen.merge(other.textlen)
+        self.speakers += other.speakers
+
+    def state_dict(self) -> Dict[str, Any]:
+        """Serializable state.
+        Returns:
+            statistics.
+        """
+        return {
+            'sr': self.sr,
+            'mel': self.mel.state_dict(),
+            'duration': self.duration.state_dict(),
+            'frames': self.frames.state_dict(),
+            'textlen': self.textlen.state_dict(),
+            'speakers': self.speakers.tolist()}
+
+    def save(self, data_dir: str):
+        """Write the statistics next to the dump.
+        Args:
+            data_dir: path to the dump directory.
+        """
+        with open(os.path.join(data_dir, DatasetStats.FILENAME), 'w') as f:
+            json.dump(self.state_dict(), f)
+
+    @staticmethod
+    def load(data_dir: str) -> Optional[Dict[str, Any]]:
+        """Read the statistics.
+        Args:
+            data_dir: path to the dump directory.
+        Returns:
+            statistics if exists.
+        """
+        path = os.path.join(data_dir, DatasetStats.FILENAME)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    @staticmethod
+    def worker(args):
+        """Compute the statistics of the shard, multiprocessing purpose.
+        Args:
+            paths: List[str], paths of the shard.
+            preproc: Callable, preprocessor.
+            config: Config, STFT parameters.
+            speakers: int, the number of the speakers.
+            sr: int, sampling rate.
+        Returns:
+            DatasetStats, statistics of the shard.
+        """
+        paths, preproc, config, speakers, sr = args
+        # accumulate on the full precision features
+        config = copy.copy(config)
+        config.dtype = 'float32'
+        melstft = MelSTFT(config)
+        stats = DatasetStats(config, speakers, sr)
+        for path in paths:
+            sid, text, audio = preproc(path)
+            stats.update(sid, text, audio, melstft(audio))
+        return stats
+
+    @classmethod
+    def compute(cls,
+                dataset,
+                config: Config,
+                num_proc: Optional[int] = None,
+                shards: Optional[int] = None):
+        """Compute the statistics in parallel workers.
+        Args:
+            dataset: Union[DataReader, SpeechSet], target dataset.
+            config: STFT parameters.
+            num_proc: the number of the processes, single process if not provided.
+            shards: the number of the shards, four times of the processes default.
+        Returns:
+            DatasetStats, merged statistics.
+        """
+        if isinstance(dataset, DataReader):
+            reader, paths = dataset, list(dataset.dataset())
+        else:
+            # SpeechSet
+            reader, paths = dataset.reader, dataset.indexer
+        preproc, speakers = reader.preproc(), len(reader.speakers())
+        sr = getattr(reader, 'sr', None) or config.sr
+        shards = shards or 4 * (num_proc or 1)
+        args = [
+            (list(shard), preproc, config, speakers, sr)
+            for shard in np.array_split(np.array(paths, dtype=object), shards)]
+
+        stats = cls(config, speakers, sr)
+        if num_proc is None:
+            for shard in tqdm(map(cls.worker, args), total=len(args)):
+                stats.merge(shard)
+        else:
+            with mp.Pool(num_proc) as pool:
+                for shard in tqdm(pool.imap_unordered(cls.worker, args), total=len(args)):
+                    stats.merge(shard)
+        return stats
+
+
+if __name__ == '__main__':
+    def main():
+        import argparse
+        from .dump import DumpReader
+        parser = argparse.ArgumentParser()
+        parser.add_argument('--data-dir', required=True)
+        parser.add_argument('--num-proc', default=None, type=int)
+        args = parser.parse_args()
+
+        reader = DumpReader(args.data_dir)
+        config = Config()
+        config.sr = reader.sr
+        stats = DatasetStats.compute(reader, config, args.num_proc)
+        stats.save(args.data_dir)
+
+        std = stats.mel.std
+        print(f'[*] {stats.mel.count} frames of {int(stats.duration.counts.sum())} utterances, '
+              f'mel std range [{std.min():.4f}, {std.max():.4f}]')
+
+    main()
@@ -0,0 +1,98 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+class SilenceTrimmer:
+    """Trim leading and trailing silence with frame energies,
+    and optionally normalize the peak or the loudness.
+    """
+    def __init__(self,
+                 top_db: Optional[float] = 60.,
+                 frame: int = 2048,
+                 hop: int = 512,
+                 margin: int = 0,
+                 peak: Optional[float] = None,
+                 loudness: Optional[float] = None):
+        """Initializer.
+        Args:
+            top_db: threshold in decibels below the loudest frame to consider as silence,
+                no trimming if None is provided.
+            frame: size of the energy frame.
+            hop: stride of the energy frame.
+            margin: number of the samples to keep on both sides of the voiced region.
+            peak: target peak amplitude, no peak normalization if None is provided.
+            loudness: target rms level of the voiced region in dBFS,
+                no loudness normalization if None is provided.
+                exclusive with `peak`, since the later normalization overrides the former.
+        """
+        assert peak is None or loudness is None, \
+            'only one of `peak` and `loudness` normalization could be applied'
+        self.top_db = top_db
+        self.frame = frame
+        self.hop = hop
+        self.margin = margin
+        self.peak = peak
+        self.loudness = loudness
+
+    def energy(self, audio: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Compute frame energies with cumulative sum of the squared signal.
+        Args:
+            audio: [np.float32; [T]], audio signal.
+        Returns:
+            starts: [np.long; [F]], starting indices of the frames,
+                the last frame is aligned to the end of the signal.
+            energy: [np.float64; [F]], mean power of the frames.
+        """
+        frame = min(self.frame, len(audio))
+        # [T + 1]
+        cumsum = np.concatenate([[0.], np.cumsum(np.square(audio, dtype=np.float64))])
+        # [F]
+        starts = np.arange(0, len(audio) - frame + 1, self.hop)
+        if starts[-1] < len(audio) - frame:
+            # score the tail samples not covered by the strided frames
+            starts = np.append(starts, len(audio) - frame)
+        return starts, (cumsum[starts + frame] - cumsum[starts]) / max(frame, 1)
+
+    def __call__(self, audio: np.ndarray) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """Trim silence and normalize the loudness.
+        Args:
+            audio: [np.float32; [T]], audio signal.
+        Returns:
+            [np.float32; [T']], trimmed signal.
+            start and end offsets of the trimmed region on the original signal.
+        """
+        if len(audio) == 0:
+            return audio, (0, 0)
+        # [F], [F]
+        starts, energy = self.energy(audio)
+        # [F], log-scale power
+        db = 10 * np.log10(np.maximum(energy, 1e-10))
+        # [F']
+        if self.top_db is None:
+            # normalization only
+            voiced = np.arange(len(db))
+        else:
+            voiced, = np.nonzero(db > db.max() - self.top_db)
+        if self.top_db is None or len(voiced) == 0:
+            start, end = 0, len(audio)
+        else:
+            start = max(starts[voiced[0]] - self.margin, 0)
+            # keep the tail if the last frame is voiced
+            end = len(audio) if voiced[-1] == len(starts) - 1 \
+                else min(starts[voiced[-1]] + self.frame + self.margin, len(audio))
+        # [T']
+        audio = audio[start:end]
+        if self.loudness is not None:
+            # rms level of the voiced region
+            rms = np.sqrt(energy[voiced].mean()) if len(voiced) > 0 else 0.
+            if rms > 0:
+                audio = audio * (10 ** (self.loudness / 20) / rms)
+        if self.peak is not None:
+            maxval = np.abs(audio).max(initial=0.)
+            if maxval > 0:
+                audio = audio * (self.peak / maxval)
+        elif self.loudness is not None:
+            # prevent clipping
+            audio = np.clip(audio, -1., 1.)
+        return audio.astype(np.float32), (int(start), int(end))
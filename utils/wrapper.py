@@ -13,7 +13,11 @@ class IDWrapper(SpeechSet):
         Args:
             speechset: base speechset.
         """
-        super().__init__(speechset.reader)
+        # share the cached dataset and indexer of the base speechset
+        self.reader = speechset.reader
+        self.dataset, self.preproc = speechset.dataset, speechset.preproc
+        self.indexer = speechset.indexer
+        self.augment = speechset.augment
         # hold
         self.speechset = speechset
 
@@ -30,7 +34,7 @@ class IDWrapper(SpeechSet):
         Returns:
             id and normalized datum.
         """
-        return ids, self.speechset.normalize(text, speech)
+        return ids, self.speechset.normalize(ids, text, speech)
 
     def collate(self,
                 bunch: List[Tuple[Union[int, List[int]],